@@ -1,3 +1,42 @@
 # Application File Paths, will likely put into yaml file
 PIPELINES_DIRPATH = "app/model/pipelines"
-IMAGE_CLASSIFICATION_CLASSMAP_FILENAME = "Class Map"
\ No newline at end of file
+IMAGE_CLASSIFICATION_CLASSMAP_FILENAME = "Class Map"
+
+# Application Cache Directory, derived data that is safe to delete
+CACHE_DIRPATH = "cache"
+PREDICTION_CACHE_DIRPATH = CACHE_DIRPATH + "/predictions"
+DATASET_CACHE_DIRPATH = CACHE_DIRPATH + "/datasets"  # Pre-decoded images, --dataset_format memmap
+DATASET_INDEX_DIRPATH = CACHE_DIRPATH + "/indexes"  # Directory listings, rescanned only where changed
+DATASET_STATS_DIRPATH = CACHE_DIRPATH + "/statistics"  # Per-image moments for --normalize dataset
+VALIDATION_CACHE_DIRPATH = CACHE_DIRPATH + "/validation"  # Dataset integrity scan results
+
+# Prediction Cache, one file per (run, input directory), least recently used files deleted past the limit
+PREDICTION_CACHE_MAX_BYTES = 256 * 1024 * 1024  # 256 MiB, ~1M predictions
+
+# Loaded-Model Cache, trained models kept in memory between predictions
+MODEL_CACHE_MAX_ENTRIES = 2
+MODEL_CACHE_MAX_BYTES = 1024 * 1024 * 1024  # 1 GiB, a ResNet50 model is ~100 MiB
+
+# Inference Loading, DataLoader worker processes decoding images ahead of the model, large directories only
+INFERENCE_NUM_WORKERS = 2
+
+# Feature Store, persistent backbone embeddings for runs trained with --feature_store
+FEATURE_STORE_FILEPATH = CACHE_DIRPATH + "/features.sqlite"
+FEATURE_STORE_MAX_BYTES = 4 * 1024 * 1024 * 1024  # 4 GiB, ~500k ResNet50 embeddings
+
+# Inference Precision, "int8" uses a quantized artifact made by quantizeModel when one exists
+INFERENCE_PRECISION = "fp32"
+QUANTIZATION_CALIBRATION_IMAGES = 256
+
+# Training Scheduler, queued jobs run at most this many at once
+TRAINING_MAX_CONCURRENT_JOBS = 1
+TRAINING_THREADS_PER_JOB = None  # CPU threads per running job, None splits the cores evenly
+TRAINING_EXECUTOR = "process"  # "process" trains in a child process, "thread" in the GUI process (threads not budgeted)
+STATE_CHECKPOINT_EVERY_N_BATCHES = 200  # Resumable state is also saved at every epoch start
+
+# Hyperparameter Sweeps, trials trained at once unless the sweep spec sets max_parallel
+SWEEP_MAX_PARALLEL = 2
+
+# Dataset Integrity Scan, worker processes default to one per core
+DATASET_SCAN_WORKERS = None
+DATASET_MIN_IMAGE_SIDE = 32  # Smaller images are reported
@@ -28,6 +28,11 @@ class ModelParameters:
     # Hyperparameters
     self.model_hp = ""
     self.trainer_hp = ""
+    # Training Queue
+    self.priority = 0
+    self.sweep_spec = ""    # YAML sweep spec path, see app/model/sweep.py
+    self.jobs = []          # Job summaries, in training queue order
+    self.selected_job = -1  # Row of the selected job in the queue list
     # Model Components
     self.model = None
     self.dm = None
@@ -46,24 +51,41 @@ class InferenceParameters:
     self.pipeline = "Image_Classification" 
     self.ckpt_path = None
     # Inference Output
-    self.infer_hash = None  # For caching vs. no caching 
+    self.infer_key = None   # For resetting vs. restoring the explorer position
     self.image_directory = []   # Directory of Image Path Objects
     self.predicted_labels = []  # Directory of Labels
+    self.confidences = []       # Directory of Label Probabilities
+    # Inference Job
+    self.worker = None
     # Inference Dialog
     self.slider_index = 0
 
   def getImageDirectoryLength(self):
     return len(self.image_directory)
 
+  def getDisplayLabel(self, index):
+    label = self.predicted_labels[index]
+    if index < len(self.confidences):
+      label = f"{label} ({self.confidences[index]:.1%})"
+    return label
+
   def allInferenceInputsRecieved(params):
     inferenceInputRules = [params.data_path != None 
                           and params.pipeline != None 
                           and params.ckpt_path != None]
     return all(inferenceInputRules)
 
+class DataPrepParameters:
+  def __init__(self):
+    # Program Inputs
+    self.data_path = None
+    # Scan Job
+    self.worker = None
+
 """ ---- Application Startup / Recovery ---- """
 model_parameters = ModelParameters()
 inference_parameters = InferenceParameters()
+data_prep_parameters = DataPrepParameters()
 
 def loadApplication():
   # Load in Models / Custom Model Packages.
@@ -97,6 +119,11 @@ def connectMainWindowSignals():
   # print("Callback Signals:", ui_signals)  
   # print("Registered Widgets:", ui_widgets)
 
+  # Data Prep Panel Signals
+  connect(ui_signals['prep_dirpath'], setDataPrepData)
+  connect(ui_signals['scan_button'], initializeScan)
+  connect(ui_signals['cancel_scan_button'], cancelScan)
+
   # Model Panel Signals
   connect(ui_signals['train_dirpath'], setTrainingData)
   connect(ui_signals['train_pipeline'], setTrainingPipeline)
@@ -105,16 +132,25 @@ def connectMainWindowSignals():
   connect(ui_signals['run_name'], setRunName)
   connect(ui_signals['train_button'], initializeTraining) 
   connect(ui_signals['dash_button'], launchDashboard)
+  connect(ui_signals['job_priority'], setJobPriority)
+  connect(ui_signals['sweep_spec'], setSweepSpec)
+  connect(ui_signals['sweep_button'], initializeSweep)
+  connect(ui_signals['job_selection'], setSelectedJob)
+  connect(ui_signals['cancel_job_button'], cancelTrainingJob)
+  connect(model_api.training_scheduler.signals.changed, refreshJobList)
    
   # Inference Panel Signals
   connect(ui_signals['inference_dirpath'], setInferenceData)
   connect(ui_signals['weight_selection'], setInferenceWeights)
   connect(ui_signals['inference_button'], initializeInference)
+  connect(ui_signals['cancel_inference_button'], cancelInference)
   connect(ui_signals['report_button'], generateReport)
 
   # Database Widget Signals  
   connect(ui_signals['weight_selection_rename'], renameDatabaseWeights)
   connect(ui_signals['weight_selection_deletion'], deleteDatabaseWeights)
+  connect(ui_signals['weight_selection_resume'], resumeDatabaseWeights)
+  connect(ui_signals['weight_selection_quantize'], quantizeDatabaseWeights)
   connect(ui_signals['refresh_weights'], refreshDatabaseWeights)
 
 def connectDialogSignals():
@@ -124,6 +160,58 @@ def connectDialogSignals():
   # Inference Panel Dialog 
   connect(ui_signals['toggle_inference'], toggleInference)
 
+""" ---- Control API: Data Prep Panel ---- """
+# Triggered by Upload Dataset Button
+def setDataPrepData(dirpath):
+  data_prep_parameters.data_path = dirpath
+
+# Triggered by "Scan Dataset" Button
+def initializeScan():
+  if data_prep_parameters.data_path is None:
+    view_api.displayScanFeedback("Error: Please provide a dataset directory.")
+    return
+  # Issues are listed as they are found, the scan runs off the GUI thread
+  worker = model_api.makeScanJob(data_prep_parameters.data_path)
+  data_prep_parameters.worker = worker
+
+  # Connect View Updates
+  worker.signals.started.connect(view_api.disableScanButton)
+  worker.signals.started.connect(view_api.clearScanIssues)
+  worker.signals.started.connect(partial(lambda x: view_api.displayScanFeedback(x), "Scanning Dataset..."))
+  worker.signals.progress.connect(view_api.updateScanProgress)
+  worker.signals.issues.connect(displayScanIssues)
+  worker.signals.finished.connect(presentScanReport)
+  worker.signals.cancelled.connect(partial(lambda x: view_api.displayScanFeedback(x), "Scan Cancelled."))
+  worker.signals.error.connect(scanFailed)
+  for signal in [worker.signals.finished, worker.signals.cancelled, worker.signals.error]:
+    signal.connect(view_api.enableScanButton)
+
+  # Start the Job
+  model_api.startScanJob(worker)
+
+# Triggered by Scan Cancel Button
+def cancelScan():
+  if data_prep_parameters.worker is not None:
+    data_prep_parameters.worker.cancel()
+
+# Triggered by a Scan Job, as chunks of files are checked
+def displayScanIssues(issues):
+  view_api.appendScanIssues([f"{severity.upper()}: {path} - {problem}" for severity, path, problem in issues])
+
+# Triggered by a finished Scan Job
+def presentScanReport(report):
+  data_prep_parameters.worker = None
+  if report['errors'] or report['warnings']:
+    view_api.displayScanFeedback(f"Scanned {report['num_files']} files: {report['errors']} errors, {report['warnings']} warnings.")
+  else:
+    view_api.displayScanFeedback(f"Scanned {report['num_files']} files: no issues found.")
+
+# Triggered by a failed Scan Job
+def scanFailed(traceback_string):
+  data_prep_parameters.worker = None
+  view_api.displayScanFeedback("Error: Could not scan the dataset directory.")
+  print(traceback_string)
+
 """ -------- Control API: Model Panel ----------- """
 """ Organized in order of user workflow. 
 API for accessing/modifying parameter objects."""
@@ -153,6 +241,17 @@ def setRunName(text):
   model_parameters.run_name = text
   # print(text)
 
+# Triggered by Text Change in Queue Priority Line Edit
+def setJobPriority(text):
+  try:
+    model_parameters.priority = int(text)
+  except ValueError:
+    model_parameters.priority = 0
+
+# Triggered by Text Change in Sweep Spec Line Edit
+def setSweepSpec(text):
+  model_parameters.sweep_spec = text.strip()
+
 # Triggered by "Train" Button
 def initializeTraining():
   if not model_parameters.allTrainingInputsRecieved():
@@ -176,16 +275,19 @@ def initializeTraining():
       # Create Training Job 
       worker = model_api.makeTrainingJob(model_parameters.pipeline, model_parameters.run_name, model_input, trainer_input)
       
-      # Connect View Updates 
+      # Connect View Updates, Train stays enabled so further runs are queued
       progress_string = f"Running Training Job: {model_parameters.run_name}"
       worker.signals.started.connect(partial(lambda x: view_api.displayProgressPresentation(x), progress_string))
-      worker.signals.started.connect(view_api.disableTrainButton)
+      worker.signals.progress.connect(partial(displayTrainingProgress, model_parameters.run_name))
       end_string = f"Training Job Finished! Saving Trained Model: {model_parameters.run_name}"
       worker.signals.finished.connect(partial(lambda x: view_api.displayProgressPresentation(x), end_string))
-      worker.signals.finished.connect(view_api.enableTrainButton)
+      error_string = f"Training Job Failed: {model_parameters.run_name}"
+      worker.signals.error.connect(partial(lambda x, traceback_string: view_api.displayProgressPresentation(x), error_string))
+      worker.signals.error.connect(print)
 
-      # Start the Job
-      model_api.startTrainingJob(worker)
+      # Queue the Job
+      model_api.startTrainingJob(worker, priority=model_parameters.priority)
+      view_api.displayProgressPresentation(f"Queued Training Job: {model_parameters.run_name}")
 
     except Exception:
       error_string = "Error: Please provide training data in expected format " + \
@@ -193,22 +295,89 @@ def initializeTraining():
       view_api.displayTrainingErrorPresentation(error_string=error_string)
       print(traceback.format_exc())
 
+# Triggered by "Run Sweep" Button, the experiment name prefixes the trial runs
+def initializeSweep():
+  if not model_parameters.allTrainingInputsRecieved() or not Path(model_parameters.sweep_spec).is_file():
+    error_string="Error: Please provide training data and a sweep spec file."
+    view_api.displayTrainingErrorPresentation(error_string=error_string)
+    return
+
+  try:
+    model_input = [model_parameters.data_path] + shlex.split(model_parameters.model_hp)
+    trainer_input = shlex.split(model_parameters.trainer_hp)
+    sweep_name = model_parameters.run_name
+    worker = model_api.makeSweepJob(model_parameters.pipeline, sweep_name, model_input, trainer_input, 
+                                    model_parameters.sweep_spec)
+
+    # Connect View Updates
+    worker.signals.trials.connect(partial(displaySweepProgress, sweep_name))
+    worker.signals.trials.connect(lambda trials: refreshDatabaseWeights())
+    end_string = f"Sweep Finished! Summary saved next to the runs: {sweep_name}"
+    worker.signals.finished.connect(partial(lambda x: view_api.displayProgressPresentation(x), end_string))
+    error_string = f"Sweep Failed: {sweep_name}"
+    worker.signals.error.connect(partial(lambda x, traceback_string: view_api.displayProgressPresentation(x), error_string))
+    worker.signals.error.connect(print)
+
+    # Queue the Sweep
+    model_api.startTrainingJob(worker, priority=model_parameters.priority)
+    view_api.displayProgressPresentation(f"Queued Sweep: {sweep_name}")
+
+  except Exception as error:
+    error_string = f"Error: Please provide a valid sweep spec and hyperparameters. {error}"
+    view_api.displayTrainingErrorPresentation(error_string=error_string)
+    print(traceback.format_exc())
+
+# Triggered by Sweep Trial Start / End
+def displaySweepProgress(sweep_name, trials):
+  lines = [f"{trial['run_name']}: {trial['status']}" + 
+           (f", val_acc {trial['best_val_acc']:.4f}" if trial['best_val_acc'] is not None else "") +
+           (f", {trial['error'].strip().splitlines()[-1]}" if trial['error'] else "") for trial in trials]
+  view_api.displayProgressPresentation(f"Running Sweep: {sweep_name}\n" + "\n".join(lines))
+
 def launchDashboard():
   model_api.launchTensorboard()
 
+# Triggered by Training Job Progress
+def displayTrainingProgress(run_name, progress):
+  metrics = "  ".join(f"{name}: {value:.4f}" for name, value in sorted(progress['metrics'].items()))
+  view_api.displayProgressPresentation(f"Running Training Job: {run_name}\n"
+                                       f"Epoch {progress['epoch']}/{progress['max_epochs']}, "
+                                       f"Batch {progress['batch']}/{progress['num_batches']}\n{metrics}")
+
+# Triggered by Training Scheduler State Changes
+def refreshJobList(jobs):
+  model_parameters.jobs = jobs
+  job_strings = [f"{job['name']}: {job['state']} (priority {job['priority']}, {job['threads']} threads)" for job in jobs]
+  view_api.refreshJobList(job_strings)
+
+# Triggered by Training Queue List Selection
+def setSelectedJob(row):
+  model_parameters.selected_job = row
+
+# Triggered by "Cancel Queued Job" Button
+def cancelTrainingJob():
+  if not 0 <= model_parameters.selected_job < len(model_parameters.jobs):
+    view_api.displayJobFeedback("Error: Please select a queued job.")
+    return
+  job = model_parameters.jobs[model_parameters.selected_job]
+  if model_api.cancelTrainingJob(job['id']):
+    view_api.displayJobFeedback(f"Cancelled Training Job: {job['name']}")
+    refreshDatabaseWeights()
+  else:
+    view_api.displayJobFeedback(f"Only queued jobs can be cancelled, {job['name']} is {job['state']}.")
+
 """ ---- Control API: Inference Panel ---- """
 # Triggered by Upload Inference Data Button
 def setInferenceData(dirpath):
+  # The listing is built by the inference job, predictions carry their image paths
   inference_parameters.data_path = dirpath 
-  inference_parameters.image_directory = [str(image_path) for image_path in Path(dirpath).iterdir()]
   # print(dirpath)
 
 # Triggered by Weight Panel List Widgets
 def setInferenceWeights(signal):
   name, index = signal 
   inference_parameters.pipeline = name
-  weight_directory = (Path("database") / inference_parameters.pipeline).iterdir()
-  pipeline_weights = [ckpt_path for ckpt_path in weight_directory]
+  pipeline_weights = utils.getRunDirectories(Path("database") / inference_parameters.pipeline)
   inference_parameters.ckpt_path = pipeline_weights[index] 
   # print(inference_parameters.ckpt_path)
 
@@ -219,49 +388,78 @@ def initializeInference():
     view_api.displayInferenceErrorPresentation(error_string=error_string)
   else:
     try: 
-      # Calculate Directory hash for caching
-      md5_hash = utils.md5_dir(inference_parameters.data_path)
-      infer_hash = md5_hash + str(hash(inference_parameters.pipeline))
-
-      # Set hash and predictions for first input directory and any new/modified input directories
-      if inference_parameters.infer_hash is None or inference_parameters.infer_hash != infer_hash:  
-        inference_parameters.infer_hash = infer_hash
-        setInferenceData(inference_parameters.data_path)
-        predictions = model_api.predict(inference_parameters.pipeline, inference_parameters.data_path, inference_parameters.ckpt_path)
-        inference_parameters.predicted_labels = predictions['labels']
-
-        # Initialize View w/ index = 0
-        slider_max = inference_parameters.getImageDirectoryLength()
-        image_path = inference_parameters.image_directory[0]
-        label = inference_parameters.predicted_labels[0]
-        view_api.presentInferenceView(image_path, label, slider_max)
-
-        # Reset the Report Button Feedback 
-        view_api.clearReportButtonFeedback()
-
-      # Otherwise, hashes are equal. Use previously computed predictions
-      else:
-        # Initialize View w/ last index
-        slider_max = inference_parameters.getImageDirectoryLength()
-        image_path = inference_parameters.image_directory[inference_parameters.slider_index]
-        label = inference_parameters.predicted_labels[inference_parameters.slider_index]
-        view_api.presentInferenceView(image_path, label, slider_max)
-
-      # Clear any error string
-      view_api.displayInferenceErrorPresentation(error_string="")
-      print("Loading Image Explorer...")
+      # Predictions are cached per image, only new/modified images are inferred.
+      # Inference runs off the GUI thread, results are presented when the job finishes.
+      worker = model_api.makeInferenceJob(inference_parameters.pipeline, inference_parameters.data_path, inference_parameters.ckpt_path)
+      inference_parameters.worker = worker
+      
+      # Connect View Updates 
+      worker.signals.started.connect(view_api.disableInferenceButton)
+      worker.signals.started.connect(partial(lambda x: view_api.displayInferenceErrorPresentation(x), "Running Inference..."))
+      worker.signals.progress.connect(view_api.updateInferenceProgress)
+      worker.signals.finished.connect(presentPredictions)
+      worker.signals.cancelled.connect(partial(lambda x: view_api.displayInferenceErrorPresentation(x), "Inference Cancelled."))
+      worker.signals.error.connect(inferenceFailed)
+      for signal in [worker.signals.finished, worker.signals.cancelled, worker.signals.error]:
+        signal.connect(view_api.enableInferenceButton)
+
+      # Start the Job
+      model_api.startInferenceJob(worker)
 
     except Exception:
       error_string = "Error: Please provide test data as plain image directory."
       view_api.displayInferenceErrorPresentation(error_string=error_string)
       print(traceback.format_exc())    
 
+# Triggered by Inference Cancel Button
+def cancelInference():
+  if inference_parameters.worker is not None:
+    inference_parameters.worker.cancel()
+
+# Triggered by a finished Inference Job
+def presentPredictions(predictions):
+  inference_parameters.worker = None
+  try:
+    infer_key = (inference_parameters.pipeline, str(inference_parameters.ckpt_path), tuple(predictions['image_paths']))
+
+    # Reset the explorer for first input directory and any new/changed image listing
+    if inference_parameters.infer_key != infer_key:
+      inference_parameters.infer_key = infer_key
+      inference_parameters.slider_index = 0
+      # Reset the Report Button Feedback 
+      view_api.clearReportButtonFeedback()
+    inference_parameters.image_directory = predictions['image_paths']
+    inference_parameters.predicted_labels = predictions['labels']
+    inference_parameters.confidences = predictions['confidences']
+
+    # Initialize View w/ last index
+    slider_max = inference_parameters.getImageDirectoryLength()
+    image_path = inference_parameters.image_directory[inference_parameters.slider_index]
+    label = inference_parameters.getDisplayLabel(inference_parameters.slider_index)
+    view_api.presentInferenceView(image_path, label, slider_max)
+
+    # Clear any error string
+    view_api.displayInferenceErrorPresentation(error_string="")
+    print("Loading Image Explorer...")
+
+  except Exception:
+    error_string = "Error: Please provide test data as plain image directory."
+    view_api.displayInferenceErrorPresentation(error_string=error_string)
+    print(traceback.format_exc())    
+
+# Triggered by a failed Inference Job
+def inferenceFailed(traceback_string):
+  inference_parameters.worker = None
+  error_string = "Error: Please provide test data as plain image directory."
+  view_api.displayInferenceErrorPresentation(error_string=error_string)
+  print(traceback_string)
+
 """ ---- Control API: Inference Dialog ---- """
 # Triggered by Slider 
 def toggleInference(index):
   inference_parameters.slider_index = index
   image_path = inference_parameters.image_directory[index]
-  label = inference_parameters.predicted_labels[index]
+  label = inference_parameters.getDisplayLabel(index)
   view_api.updateInferenceView(image_path, label)
 
 """ ---- Control API: Database Utils ---- """
@@ -269,7 +467,7 @@ def toggleInference(index):
 def renameDatabaseWeights(signal):
   name, index, updated_name = signal 
   if index != -1:
-    weight_directory = list((Path("database") / name).iterdir())
+    weight_directory = utils.getRunDirectories(Path("database") / name)
     weight_path = weight_directory[index]
     updated_path = Path(weight_path.parent, f"{updated_name}") 
     # Check if we are renaming the active weights
@@ -280,7 +478,7 @@ def renameDatabaseWeights(signal):
 
 def deleteDatabaseWeights(signal):
   name, index, deleted_name = signal
-  weight_directory = list((Path("database") / name).iterdir())
+  weight_directory = utils.getRunDirectories(Path("database") / name)
   weight_path = weight_directory[index]
   # Check if we are deleting the active weights
   if weight_path == inference_parameters:
@@ -288,12 +486,55 @@ def deleteDatabaseWeights(signal):
   shutil.rmtree(weight_path)
   # print("Updated State: ", inference_parameters.ckpt_path)
 
+# Triggered by "Resume Training" in the Weight List Popup Menu
+def resumeDatabaseWeights(signal):
+  pipeline, index, run_name = signal
+  try:
+    worker = model_api.makeResumeJob(pipeline, run_name)
+  except Exception as error:
+    view_api.refreshInferenceWeightFeedback(f"Error: Cannot resume {run_name}. {error}")
+    print(traceback.format_exc())
+    return
+
+  # Connect View Updates, progress is shown in the Model Panel
+  progress_string = f"Resuming Training Job: {run_name}"
+  worker.signals.started.connect(partial(lambda x: view_api.displayProgressPresentation(x), progress_string))
+  worker.signals.progress.connect(partial(displayTrainingProgress, run_name))
+  end_string = f"Training Job Finished! Saving Trained Model: {run_name}"
+  worker.signals.finished.connect(partial(lambda x: view_api.displayProgressPresentation(x), end_string))
+  error_string = f"Training Job Failed: {run_name}"
+  worker.signals.error.connect(partial(lambda x, traceback_string: view_api.displayProgressPresentation(x), error_string))
+  worker.signals.error.connect(print)
+
+  model_api.startTrainingJob(worker, priority=model_parameters.priority)
+  view_api.refreshInferenceWeightFeedback(f"Queued Resumed Training Job: {run_name}")
+
+# Triggered by Weight Panel "Quantize to INT8" Action
+def quantizeDatabaseWeights(signal):
+  pipeline, index, run_name = signal
+  ckpt_dir = "database" + '/' + pipeline + '/' + run_name
+  worker = model_api.makeQuantizeJob(pipeline, ckpt_dir)
+
+  # Connect View Updates
+  worker.signals.started.connect(partial(view_api.refreshInferenceWeightFeedback, f"Quantizing {run_name}..."))
+  worker.signals.finished.connect(partial(presentQuantizationReport, run_name))
+  error_string = f"Error: Quantization of {run_name} failed."
+  worker.signals.error.connect(partial(lambda x, traceback_string: view_api.refreshInferenceWeightFeedback(x), error_string))
+  worker.signals.error.connect(print)
+
+  # Execute
+  model_api.startQuantizeJob(worker)
+
+def presentQuantizationReport(run_name, report):
+  view_api.refreshInferenceWeightFeedback(f"Quantized {run_name}: accuracy {report['fp32_accuracy']:.3f} -> "
+                                         f"{report['int8_accuracy']:.3f}, {report['speedup']:.2f}x faster")
+
 # Triggered by Refresh Button, also called on application initialization
 def refreshDatabaseWeights():
   # Pass along list of strings to view
-  for dirpath in Path("database").iterdir(): 
+  for dirpath in utils.getRunDirectories("database"): 
     pipeline = dirpath.name
-    weight_names = [path.stem for path in Path(dirpath).iterdir()]
+    weight_names = [path.stem for path in utils.getRunDirectories(dirpath)]
     view_api.refreshDatabaseWeights(pipeline, weight_names)
 
 
@@ -356,6 +597,5 @@ def generateReport():
     f.write(f"Image Directory: {inference_parameters.data_path} \n")
     if inference_parameters.pipeline == "Image_Classification":
       
-      for image, label in zip(inference_parameters.image_directory,
-                              inference_parameters.predicted_labels):
-        f.write(f"{Path(image).stem}   {label} \n")
\ No newline at end of file
+      for index, image in enumerate(inference_parameters.image_directory):
+        f.write(f"{Path(image).stem}   {inference_parameters.getDisplayLabel(index)} \n")
\ No newline at end of file
@@ -1,16 +1,17 @@
 # ---- Standard Lib Imports ----
 import os
+import sys
+import json
 import shutil
+import subprocess
 from pathlib import Path
 import tensorboard
 import yaml
 import glob
+import traceback
+import multiprocessing
 
 # ---- External Lib Imports ----
-from argparse import ArgumentParser
-from pytorch_lightning import Trainer
-from pytorch_lightning.callbacks.model_checkpoint import ModelCheckpoint
-from pytorch_lightning.loggers import TensorBoardLogger
 
 from PyQt5.QtCore import QObject, pyqtSignal, QThreadPool, QRunnable
 
@@ -25,99 +26,296 @@ import app.model.pipelines.Image_Classification as ImageClassification
 
 import app.utils as utils
 from .. import config
+from .prediction import predict, getModelCacheStats, quantizeModel  # Qt-free, shared with the command line
+from .scheduler import JobScheduler
+from . import training
+from .checkpointing import get_state_path, load_job
+from . import sweep
 
 """ ---- Multithreading Objects ----- """
 class WorkerSignals(QObject):
   started = pyqtSignal()
+  progress = pyqtSignal(dict)  # epoch / batch position and latest metrics
   finished = pyqtSignal()
+  error = pyqtSignal(str)
 
+# Trains in a thread of the GUI process. Torch's intra-op thread count is process-wide, so neither
+# the thread budget nor --num_threads is applied here, the budget only caps the loader workers
+# auto-tuning picks. Concurrent jobs get separate thread counts under the process executor.
 class Worker(QRunnable):
-  def __init__(self, pipeline, run_name, trainer, model, datamodule):
+  def __init__(self, pipeline, run_name, model_dict, trainer_dict, resume=False):
     super().__init__()
     self.signals = WorkerSignals()
     self.pipeline = pipeline
     self.run_name = run_name
-    self.trainer = trainer
-    self.model = model
-    self.datamodule = datamodule
+    self.model_dict = model_dict
+    self.trainer_dict = trainer_dict
+    self.resume = resume  # Continue from the run's last full-state checkpoint
+    self.num_threads = None  # CPU thread budget, set by the training scheduler
 
   def run(self):
     self.signals.started.emit()
-    self.trainer.fit(self.model, self.datamodule)
+    try:
+      progress = training.ProgressCallback(self.signals.progress.emit)
+      trainer, model, datamodule = training.build_training(self.pipeline, self.run_name, self.model_dict, 
+                                                           self.trainer_dict, callbacks=[progress], resume=self.resume, 
+                                                           cpu_budget=self.num_threads)
+      training.fit_and_export(self.pipeline, self.run_name, trainer, model, datamodule)
+    except Exception:
+      self.signals.error.emit(traceback.format_exc())
+      return
     self.signals.finished.emit()
 
+# Trains in a child process, so the training loop never holds the GUI's GIL and a crash 
+# only ends the job. The pool thread relays the child's events to the same signals.
+class ProcessWorker(Worker):
+  def run(self):
+    self.signals.started.emit()
+    context = multiprocessing.get_context('spawn')  # Forking a Qt process is unsafe
+    events = context.Queue()
+    process = context.Process(target=training.run_training_process, 
+                              args=(self.pipeline, self.run_name, self.model_dict, self.trainer_dict, 
+                                    self.num_threads, events, (), self.resume))
+    process.start()
+    while True:
+      event = training.get_process_event(process, events, timeout=0.5)
+      if event is None:
+        continue
+      kind, payload = event
+      if kind == "progress":
+        self.signals.progress.emit(payload)
+      elif kind == "error":
+        process.join()
+        self.signals.error.emit(payload)
+        return
+      elif kind == "finished":
+        process.join()
+        self.signals.finished.emit()
+        return
+
+class SweepWorkerSignals(WorkerSignals):
+  trials = pyqtSignal(list)  # trial summaries, whenever a trial starts or ends
+
+# Runs a whole sweep as one scheduler job, trials run in child processes of their own
+class SweepWorker(QRunnable):
+  def __init__(self, pipeline, sweep_runner):
+    super().__init__()
+    self.signals = SweepWorkerSignals()
+    self.pipeline = pipeline
+    self.run_name = sweep_runner.sweep_name
+    self.sweep_runner = sweep_runner
+    self.num_threads = None  # CPU thread budget, split across parallel trials
+
+  def run(self):
+    self.signals.started.emit()
+    self.sweep_runner.num_threads = self.num_threads
+    try:
+      self.sweep_runner.run(on_update=self.signals.trials.emit)
+    except Exception:
+      self.signals.error.emit(traceback.format_exc())
+      return
+    self.signals.finished.emit()
+
+class InferenceWorkerSignals(QObject):
+  started = pyqtSignal()
+  progress = pyqtSignal(int, int)   # (completed images, total images)
+  partial = pyqtSignal(object)      # predictions of the latest inferred batch
+  finished = pyqtSignal(object)     # predictions of the whole directory
+  cancelled = pyqtSignal()
+  error = pyqtSignal(str)
+
+class InferenceWorker(QRunnable):
+  def __init__(self, pipeline, data_dir, ckpt_dir):
+    super().__init__()
+    self.signals = InferenceWorkerSignals()
+    self.pipeline = pipeline
+    self.data_dir = data_dir
+    self.ckpt_dir = ckpt_dir
+    self.cancel_event = threading.Event()
+
+  def run(self):
+    self.signals.started.emit()
+    try:
+      predictions = predict(self.pipeline, self.data_dir, self.ckpt_dir, 
+                            on_progress=self._emitProgress, is_cancelled=self.cancel_event.is_set)
+    except Exception:
+      self.signals.error.emit(traceback.format_exc())
+      return
+    if predictions is None:
+      self.signals.cancelled.emit()
+    else:
+      self.signals.finished.emit(predictions)
+
+  # Safe to call from the GUI thread, checked between batches
+  def cancel(self):
+    self.cancel_event.set()
+
+  def _emitProgress(self, completed, total, batch_predictions):
+    self.signals.progress.emit(completed, total)
+    if batch_predictions is not None:
+      self.signals.partial.emit(batch_predictions)
+
+class QuantizeWorkerSignals(QObject):
+  started = pyqtSignal()
+  finished = pyqtSignal(object)     # quantization report
+  error = pyqtSignal(str)
+
+class QuantizeWorker(QRunnable):
+  def __init__(self, pipeline, ckpt_dir):
+    super().__init__()
+    self.signals = QuantizeWorkerSignals()
+    self.pipeline = pipeline
+    self.ckpt_dir = ckpt_dir
+
+  def run(self):
+    self.signals.started.emit()
+    try:
+      report = quantizeModel(self.pipeline, self.ckpt_dir)
+    except Exception:
+      self.signals.error.emit(traceback.format_exc())
+      return
+    self.signals.finished.emit(report)
+
+class ScanWorkerSignals(QObject):
+  started = pyqtSignal()
+  progress = pyqtSignal(int, int)   # (checked files, total files)
+  issues = pyqtSignal(list)         # [severity, relative path, problem] found since the last update
+  finished = pyqtSignal(object)     # report of the whole dataset
+  cancelled = pyqtSignal()
+  error = pyqtSignal(str)
+
+# Runs the scan as "python -m app.scan", so the scan's own worker processes do not
+# re-import the Qt application. Events arrive as JSON lines on the child's stdout.
+class ScanWorker(QRunnable):
+  def __init__(self, dirpath):
+    super().__init__()
+    self.signals = ScanWorkerSignals()
+    self.dirpath = dirpath
+    self.process = None
+    self.lock = threading.Lock()
+    self.cancelled = False
+
+  def run(self):
+    self.signals.started.emit()
+    outcome = None
+    try:
+      with self.lock:
+        self.process = subprocess.Popen([sys.executable, "-m", "app.scan", "--input", self.dirpath, "--events"],
+                                        stdin=subprocess.PIPE, stdout=subprocess.PIPE, universal_newlines=True)
+        if self.cancelled:
+          self._sendCancel()
+      for line in self.process.stdout:
+        kind, payload = json.loads(line)
+        if kind == "progress":
+          completed, total, issues = payload
+          self.signals.progress.emit(completed, total)
+          if issues:
+            self.signals.issues.emit(issues)
+        else:
+          outcome = (kind, payload)
+      self.process.wait()
+    except Exception:
+      self.signals.error.emit(traceback.format_exc())
+      return
+    if outcome is None:
+      self.signals.error.emit(f"Scan process exited with code {self.process.returncode}.")
+    elif outcome[0] == "cancelled":
+      self.signals.cancelled.emit()
+    else:
+      self.signals.finished.emit(outcome[1])
+
+  # Safe to call from the GUI thread, the scan stops between chunks of files
+  def cancel(self):
+    with self.lock:
+      self.cancelled = True
+      if self.process is not None:
+        self._sendCancel()
+
+  def _sendCancel(self):
+    try:
+      self.process.stdin.write("cancel\n")
+      self.process.stdin.flush()
+    except OSError:  # Already finished
+      pass
+
 threadpool = QThreadPool()
+training_scheduler = JobScheduler(config.TRAINING_MAX_CONCURRENT_JOBS, config.TRAINING_THREADS_PER_JOB)
 tensorboard_thread = None
 
 """ ---- Model API: Preprocess Panel ---- """
+# Checks every file of a dataset in worker processes, cached results of unchanged files come first
+def makeScanJob(dirpath):
+  return ScanWorker(dirpath)
 
+def startScanJob(worker):
+  threadpool.start(worker)
 
 """ ---- Model API: Model Panel ---- """
-def _set_ckpt_callback(pipeline, run_name):
-  output_directory = "database" + '/' + pipeline + '/' + run_name
-  checkpoint_callback = ModelCheckpoint(
-    dirpath = output_directory, 
-    save_weights_only = True,
-    monitor = 'val_acc',
-    mode = 'max', 
-    save_top_k = 1
-  )
-  return checkpoint_callback
-
-def _set_logger(pipeline, run_name):
-  logger = TensorBoardLogger(save_dir='database', name = pipeline, version = run_name) # Creates a logging directory w/ experiment name
-  return logger
-
 def makeTrainingJob(pipeline, run_name, model_input, trainer_input):
-  # Init argparsers for input verification
-  model_parser = ArgumentParser("Model Parser")
-  model_parser.add_argument('input_dirpath')
-  trainer_parser = ArgumentParser("Trainer Parser")
-  trainer_parser = Trainer.add_argparse_args(trainer_parser)
-  
-  # Verify Trainer Hyperparameters
-  trainer_dict = vars(trainer_parser.parse_args(trainer_input))
-  # Verify Model-Specific Hyperparameters
-  if pipeline == "Image_Classification":
-    model_parser = ImageClassification.datamodule.DataModule.add_model_specific_args(model_parser)
-    model_parser = ImageClassification.model.Model.add_model_specific_args(model_parser)
-    model_dict = vars(model_parser.parse_args(model_input))
-
-  # Set Model-Specific Trainer Defaults:
-  if pipeline == "Image_Classification":
-    if trainer_dict["max_epochs"] == None:
-      trainer_dict["max_epochs"] = 10
-
-  # Init Trainer and output directories of Trainer
-  output_directory = "database" + '/' + pipeline + '/' + run_name
-  os.mkdir(output_directory)
-  trainer_dict['logger'] = _set_logger(pipeline, run_name)
-  trainer_dict['callbacks'] = [_set_ckpt_callback(pipeline, run_name)]
-  trainer = Trainer(**trainer_dict)
-
-  # Perform Pipeline-Specific Actions:
-  if pipeline == "Image_Classification":  # Comes with Class Map 
-    # TODO: Derive Class Map as opposed to expecting user to provide.
-
-    # Specify number of classes in model and copy the class map to the output directory
-    class_map_path = model_dict['input_dirpath'] + '/' + config.IMAGE_CLASSIFICATION_CLASSMAP_FILENAME + ".txt"
-    model_dict['num_classes'] = utils.getNumberOfClasses(class_map_path)
-    shutil.copy2(class_map_path, output_directory)
-
-  # Init Datamodule and Model
-  datamodule = ImageClassification.datamodule.DataModule(model_dict)
-  model = ImageClassification.model.Model(model_dict)
-
-  # Init Worker
-  worker = Worker(pipeline, run_name, trainer, model, datamodule)
+  # Verify Hyperparameters, then reserve the output directory of Trainer
+  model_dict, trainer_dict = training.parse_training_args(pipeline, model_input, trainer_input)
+  if run_name in _getActiveRunNames(pipeline):  # Queued sweeps reserve their names, not directories
+    raise ValueError(f"{run_name} is already queued or training.")
+  training.prepare_run(pipeline, run_name, model_dict, trainer_dict)
+
+  # Init Worker, Datamodule and Model are built with the Trainer
+  if config.TRAINING_EXECUTOR == "process":
+    worker = ProcessWorker(pipeline, run_name, model_dict, trainer_dict)
+  else:
+    worker = Worker(pipeline, run_name, model_dict, trainer_dict)
 
   # Return worker to Controller for any view connections
   return worker
 
-# Call after making any view connections
-def startTrainingJob(worker):
+# Rebuilds an interrupted run from its saved job, queue with startTrainingJob
+def makeResumeJob(pipeline, run_name):
+  run_dirpath = "database" + '/' + pipeline + '/' + run_name
+  if not get_state_path(run_dirpath).is_file():
+    raise FileNotFoundError(f"No resumable training state saved for {run_name}.")
+  if run_name in _getActiveRunNames(pipeline):
+    raise ValueError(f"{run_name} is already queued or training.")
+  job = load_job(run_dirpath)
+  worker_type = ProcessWorker if config.TRAINING_EXECUTOR == "process" else Worker
+  return worker_type(pipeline, run_name, job['model_dict'], job['trainer_dict'], resume=True)
+
+# Call after making any view connections, queues the job and returns its id
+def startTrainingJob(worker, priority=0):
   # Run Training
-  threadpool.start(worker)
+  return training_scheduler.submit(worker.run_name, worker, priority=priority).id
+
+# Removes a queued job and its reserved output directory, running jobs are not interrupted.
+# A resumed run's directory holds its checkpoints and is kept, a queued sweep has none yet.
+def cancelTrainingJob(job_id):
+  job = training_scheduler.cancel(job_id)
+  if job is None:
+    return False
+  if not getattr(job.worker, 'resume', False) and not isinstance(job.worker, SweepWorker):
+    shutil.rmtree("database" + '/' + job.worker.pipeline + '/' + job.worker.run_name, ignore_errors=True)
+  return True
+
+def getTrainingJobs():
+  return training_scheduler.summaries()
+
+# Runs written by queued or running jobs, including the trials of sweeps
+def _getActiveRunNames(pipeline):
+  run_names = set()
+  for job in training_scheduler.active():
+    if job.worker.pipeline == pipeline:
+      run_names.add(job.worker.run_name)
+      if hasattr(job.worker, 'sweep_runner'):
+        run_names.update(job.worker.sweep_runner.run_names())
+  return run_names
+
+# Verifies every trial of the sweep spec, queue with startTrainingJob like a training job
+def makeSweepJob(pipeline, sweep_name, model_input, trainer_input, spec_path):
+  sweep_runner = sweep.Sweep(pipeline, sweep_name, sweep.load_spec(spec_path), model_input, trainer_input)
+  active_run_names = _getActiveRunNames(pipeline)
+  for run_name in [sweep_name] + sweep_runner.run_names():
+    if not utils.runNameUnique(run_name):
+      raise ValueError(f"Run name already exists: {run_name}")
+    if run_name in active_run_names:
+      raise ValueError(f"{run_name} is already queued or training.")
+  return SweepWorker(pipeline, sweep_runner)
 
 def launchTensorboard():
   tensorboard_thread = threading.Thread(target=runTb)
@@ -132,20 +330,17 @@ def runTb():
   os.system('tensorboard --logdir=' + 'database')
 
 """ ---- Model API: Inference Panel ---- """
-def predict(pipeline, data_dir, ckpt_dir):
-  # Type Safety 
-  data_dir = str(data_dir)
-  ckpt_dir = str(ckpt_dir) 
-
-  # Get Checkpoint File in Checkpoint Path
-  [ckpt_file] = glob.glob(ckpt_dir + '/' + '*.ckpt')
-
-  if pipeline == "Image_Classification":
-    # Prepare Inference Inputs
-    class_mapping = utils.getClassMappingFromDirectory(ckpt_dir)
-    with open(Path(ckpt_dir) / 'hparams.yaml') as file:
-      params = yaml.load(file, Loader=yaml.FullLoader)
-
-    # Run Inference
-    classifier = ImageClassification.inference.Inference(class_mapping, params)
-    return classifier(data_dir, ckpt_file) 
\ No newline at end of file
+def makeInferenceJob(pipeline, data_dir, ckpt_dir):
+  # Return worker to Controller for any view connections
+  return InferenceWorker(pipeline, data_dir, ckpt_dir)
+
+# Call after making any view connections
+def startInferenceJob(worker):
+  threadpool.start(worker)
+
+# Calibration and the FP32 / INT8 comparison take a while, so quantization runs off the GUI thread
+def makeQuantizeJob(pipeline, ckpt_dir):
+  return QuantizeWorker(pipeline, ckpt_dir)
+
+def startQuantizeJob(worker):
+  threadpool.start(worker)
\ No newline at end of file
@@ -0,0 +1,136 @@
+# ---- Standard Lib Imports ----
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+# ---- Local Lib Imports ----
+from .cachefiles import make_cache_name, read_json, write_json
+
+""" ---- Loaded-Model Cache ---- """
+# Process-wide LRU cache of loaded models, keyed by checkpoint path and mtime.
+# Overwriting or retraining a checkpoint changes its mtime, so stale entries miss.
+class ModelCache(object):
+  def __init__(self, max_entries, max_bytes=None):
+    self.max_entries = max_entries
+    self.max_bytes = max_bytes
+    self.entries = OrderedDict()  # key -> (value, nbytes), least recently used first
+    self.total_bytes = 0
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+    self.lock = threading.Lock()
+
+  def get(self, ckpt_path, loader, sizeof=None, variant=None):
+    # loader() builds the value on a miss, sizeof(value) estimates its memory footprint
+    # variant separates differently loaded copies of one checkpoint, ex. (device, precision)
+    key = self._make_key(ckpt_path) + (variant,)
+    with self.lock:
+      if key in self.entries:
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return self.entries[key][0]
+      self.misses += 1
+      value = loader()
+      nbytes = sizeof(value) if sizeof is not None else 0
+      self.entries[key] = (value, nbytes)
+      self.total_bytes += nbytes
+      self._evict()
+      return value
+
+  def clear(self):
+    with self.lock:
+      self.entries.clear()
+      self.total_bytes = 0
+
+  def stats(self):
+    with self.lock:
+      return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+              "entries": len(self.entries), "bytes": self.total_bytes}
+
+  def _make_key(self, ckpt_path):
+    path = Path(ckpt_path).resolve()
+    return (str(path), os.stat(path).st_mtime_ns)
+
+  def _evict(self):
+    # Always keep the newest entry, even if it alone exceeds the memory limit
+    while len(self.entries) > 1 and (len(self.entries) > self.max_entries
+                                     or (self.max_bytes is not None and self.total_bytes > self.max_bytes)):
+      _, (_, nbytes) = self.entries.popitem(last=False)
+      self.total_bytes -= nbytes
+      self.evictions += 1
+
+""" ---- Per-Image Prediction Cache ---- """
+# Persistent prediction records of one input directory under one (pipeline, checkpoint, precision, artifact)
+# set, keyed by image path. A record is reused while the image's size and mtime match, so rerunning on a 
+# directory only infers new or modified images. A file only holds the directory's current images, and
+# the least recently used files are deleted past max_bytes, so disk use follows the directories in use.
+class PredictionCache(object):
+  def __init__(self, cache_dirpath, pipeline, ckpt_path, data_dir, precision="fp32", artifact_path=None, 
+               max_bytes=None):
+    # FP32 and INT8 predictions differ, as do those of a re-exported artifact
+    identity = f"{pipeline}|{self._make_identity(ckpt_path)}|{precision}|{Path(data_dir).resolve()}"
+    if artifact_path is not None:
+      identity += f"|{self._make_identity(artifact_path)}"
+    self.cache_dirpath = Path(cache_dirpath)
+    self.cache_path = self.cache_dirpath / (make_cache_name(identity) + ".json")
+    self.max_bytes = max_bytes
+    self.entries = read_json(self.cache_path)
+    self.modified = False
+
+  def lookup(self, image_paths):
+    # Returns cached records by path and the paths that still need inference.
+    # image_paths is the whole directory, records of images no longer in it are dropped.
+    cached = {}
+    missing = []
+    entries = {}
+    for image_path in image_paths:
+      key, signature = self._make_key(image_path)
+      entry = self.entries.get(key)
+      if entry is not None and entry["signature"] == signature:
+        cached[image_path] = entry["record"]
+        entries[key] = entry
+      else:
+        missing.append(image_path)
+    self.modified = self.modified or len(entries) != len(self.entries)
+    self.entries = entries
+    return cached, missing
+
+  def update(self, image_paths, records):
+    for image_path, record in zip(image_paths, records):
+      key, signature = self._make_key(image_path)
+      self.entries[key] = {"signature": signature, "record": record}
+    self.modified = True
+
+  def save(self):
+    if not self.modified:
+      if self.cache_path.is_file():
+        os.utime(self.cache_path)  # Mark as recently used
+      return
+    write_json(self.cache_path, self.entries)
+    self.modified = False
+    self._evict()
+
+  def _evict(self):
+    if self.max_bytes is None:
+      return
+    files = [(path.stat(), path) for path in self.cache_dirpath.glob("*.json") if path != self.cache_path]
+    total_bytes = self.cache_path.stat().st_size + sum(stat.st_size for stat, _ in files)
+    for stat, path in sorted(files, key=lambda stat_path: stat_path[0].st_mtime):
+      if total_bytes <= self.max_bytes:
+        break
+      try:
+        path.unlink()
+      except OSError:  # Already deleted, or in use by another process on Windows
+        continue
+      total_bytes -= stat.st_size
+
+  def _make_identity(self, path):
+    path = Path(path).resolve()
+    stat = os.stat(path)
+    return f"{path}|{stat.st_size}|{stat.st_mtime_ns}"
+
+  def _make_key(self, image_path):
+    path = Path(image_path).resolve()
+    stat = os.stat(path)
+    return str(path), [stat.st_size, stat.st_mtime_ns]
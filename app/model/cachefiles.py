@@ -0,0 +1,121 @@
+# ---- Standard Lib Imports ----
+import os
+import json
+import time
+import shutil
+import hashlib
+from contextlib import contextmanager
+from pathlib import Path
+if os.name == 'nt':
+  import msvcrt
+else:
+  import fcntl
+
+IN_USE_FILENAME = "in_use.lock"
+
+""" ---- Cache Files ---- """
+# Naming, signatures and atomic JSON files shared by the caches under cache/. Torch-free,
+# so the dataset index and the integrity scan stay cheap to import.
+
+# File name of a cache, from the parts that identify its content, ex. (root, "64x64")
+def make_cache_name(*parts):
+  identity = "|".join(str(part) for part in parts)
+  return hashlib.md5(identity.encode()).hexdigest()
+
+# Changes when an (path, target) sample is added, removed, relabeled or modified
+def make_signature(samples):
+  digest = hashlib.md5()
+  for path, target in samples:
+    stat = os.stat(path)
+    digest.update(f"{path}|{target}|{stat.st_size}|{stat.st_mtime_ns}\n".encode())
+  return digest.hexdigest()
+
+# Per process, so sweep trials writing the same cache at once never share a temporary file
+def make_temp_path(path):
+  path = Path(path)
+  return path.with_name(f"{path.name}.{os.getpid()}.tmp")
+
+# A missing or unreadable cache reads as empty
+def read_json(path):
+  try:
+    with open(path) as file:
+      return json.load(file)
+  except (OSError, ValueError):
+    return {}
+
+# Write-then-rename, an interrupted save never leaves a truncated cache
+def write_json(path, content):
+  path = Path(path)
+  path.parent.mkdir(parents=True, exist_ok=True)
+  temp_path = make_temp_path(path)
+  with open(temp_path, "w") as file:
+    json.dump(content, file)
+  os.replace(temp_path, path)
+
+# Directory cache built by build(temp_path), as cache_path/<signature>. A build is moved into place
+# complete, and an existing build of the same signature is reused, never replaced, so readers keep
+# their files. Builders of one cache_path take turns, parallel sweep trials build it only once.
+# Older builds are deleted unless a reader still has them open with open_build.
+def build_directory(cache_path, signature, build):
+  cache_path = Path(cache_path)
+  version_path = cache_path / signature
+  if version_path.is_dir():
+    return version_path
+  with file_lock(cache_path.with_name(cache_path.name + ".lock")):
+    if not version_path.is_dir():  # Unless built while waiting for the lock
+      temp_path = make_temp_path(version_path)
+      shutil.rmtree(temp_path, ignore_errors=True)
+      temp_path.mkdir(parents=True)
+      build(temp_path)
+      os.replace(temp_path, version_path)
+    for path in cache_path.iterdir():
+      if path != version_path:
+        _remove_unused(path)
+  return version_path
+
+# Marks a build as in use until the returned file is closed, readers open its files lazily
+def open_build(version_path):
+  handle = open(Path(version_path) / IN_USE_FILENAME, 'a')
+  if os.name != 'nt':
+    fcntl.flock(handle.fileno(), fcntl.LOCK_SH)
+  return handle
+
+def _remove_unused(path):
+  lock_path = path / IN_USE_FILENAME
+  try:
+    if not path.is_dir():  # Left by the flat layout of earlier versions
+      path.unlink()
+      return
+    if os.name == 'nt':
+      if lock_path.exists():
+        os.remove(lock_path)  # Fails while a reader has it open
+      shutil.rmtree(path, ignore_errors=True)
+    else:
+      with open(lock_path, 'a') as handle:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)  # Fails while a reader holds it
+        shutil.rmtree(path, ignore_errors=True)
+  except OSError:
+    pass
+
+# Exclusive across processes, released by the OS if the holder dies
+@contextmanager
+def file_lock(path, poll_seconds=0.1):
+  path = Path(path)
+  path.parent.mkdir(parents=True, exist_ok=True)
+  fd = os.open(str(path), os.O_RDWR | os.O_CREAT)
+  try:
+    if os.name == 'nt':
+      while True:
+        try:
+          msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+          break
+        except OSError:
+          time.sleep(poll_seconds)
+    else:
+      fcntl.flock(fd, fcntl.LOCK_EX)
+    yield
+  finally:
+    if os.name == 'nt':
+      os.lseek(fd, 0, os.SEEK_SET)
+      msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+    os.close(fd)
@@ -0,0 +1,134 @@
+# ---- Standard Lib Imports ----
+import os
+import copy
+import random
+import threading
+from pathlib import Path
+import yaml
+
+# ---- External Lib Imports ----
+import numpy as np
+import torch
+from pytorch_lightning.callbacks import Callback
+
+""" ---- Resumable Training State ---- """
+# Full training state lives in <run>/state/, apart from the weights-only best checkpoint
+# that inference globs for in the run directory.
+STATE_DIRNAME = "state"
+STATE_FILENAME = "last.ckpt"
+JOB_FILENAME = "job.yaml"
+
+def get_state_path(run_dirpath):
+  return Path(run_dirpath) / STATE_DIRNAME / STATE_FILENAME
+
+# Verified hyperparameters of a run, so it can be rebuilt for resuming
+def save_job(run_dirpath, pipeline, run_name, model_dict, trainer_dict):
+  job = {"pipeline": pipeline, "run_name": run_name, "model_dict": model_dict, "trainer_dict": trainer_dict}
+  with open(Path(run_dirpath) / JOB_FILENAME, 'w') as file:
+    yaml.dump(job, file)
+
+def load_job(run_dirpath):
+  with open(Path(run_dirpath) / JOB_FILENAME) as file:
+    return yaml.load(file, Loader=yaml.FullLoader)
+
+# Records hyperparameters measured once training starts, so a resumed run reuses them
+def update_job(run_dirpath, model_updates):
+  job = load_job(run_dirpath)
+  job["model_dict"].update(model_updates)
+  with open(Path(run_dirpath) / JOB_FILENAME, 'w') as file:
+    yaml.dump(job, file)
+
+# Periodically saves optimizer, scheduler, epoch, RNG and train sampler position to <run>/state/.
+# The state is snapshotted to CPU on the training thread, then written by a background thread,
+# replacing the previous file atomically. Resume with Trainer(resume_from_checkpoint=...).
+class StateCheckpoint(Callback):
+  def __init__(self, run_dirpath, every_n_batches):
+    self.state_path = get_state_path(run_dirpath)
+    self.every_n_batches = every_n_batches
+    self.position = (0, 0)       # (epoch, batches of the epoch already trained)
+    self.resume_state = None     # Restored by Lightning from the resumed checkpoint
+    self.writer = None
+
+  def on_train_start(self, trainer, pl_module):
+    if self.resume_state is None:
+      return
+    _set_rng_state(self.resume_state["rng"])
+    epoch, batches = self.resume_state["position"]
+    sampler_position = getattr(trainer.datamodule, 'sampler_position', None)
+    if sampler_position is not None and batches:
+      sampler_position.skip_epoch = epoch
+      sampler_position.skip_samples = batches * trainer.datamodule.hparams['batch_size']
+
+  def on_train_epoch_start(self, trainer, pl_module):
+    sampler_position = getattr(trainer.datamodule, 'sampler_position', None)
+    if sampler_position is not None:
+      sampler_position.epoch = trainer.current_epoch
+    # State at the start of an epoch includes the previous epoch's scheduler step
+    if trainer.current_epoch > 0:
+      self._save(trainer, trainer.current_epoch, 0)
+
+  def on_train_batch_end(self, trainer, pl_module, outputs, batch, batch_idx, *args):
+    if self.every_n_batches and (batch_idx + 1) % self.every_n_batches == 0:
+      self._save(trainer, trainer.current_epoch, batch_idx + 1)
+
+  def on_train_end(self, trainer, pl_module):
+    self._wait()
+
+  def on_save_checkpoint(self, *args):
+    return {"rng": _get_rng_state(), "position": self.position}
+
+  def on_load_checkpoint(self, callback_state):
+    self.resume_state = callback_state
+
+  def _save(self, trainer, epoch, batches):
+    # One write in flight at a time, bounds the memory held by snapshots
+    self._wait()
+    if batches and self.resume_state is not None:
+      # Batch indices restart at 0 in a resumed epoch, count from the resumed position
+      resumed_epoch, resumed_batches = self.resume_state["position"]
+      if resumed_epoch == epoch:
+        batches += resumed_batches
+    self.position = (epoch, batches)
+    checkpoint = trainer.checkpoint_connector.dump_checkpoint(weights_only=False)
+    checkpoint["epoch"] = epoch  # Lightning assumes end of epoch, continue this one instead
+    if not batches:
+      checkpoint["global_step"] = trainer.global_step  # No step taken yet in this epoch
+    snapshot = _snapshot(checkpoint)
+    self.writer = threading.Thread(target=self._write, args=(snapshot,), daemon=True)
+    self.writer.start()
+
+  def _write(self, snapshot):
+    self.state_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = self.state_path.with_name(self.state_path.name + ".tmp")
+    torch.save(snapshot, str(tmp_path))
+    os.replace(tmp_path, self.state_path)
+
+  def _wait(self):
+    if self.writer is not None:
+      self.writer.join()
+      self.writer = None
+
+def _snapshot(obj):
+  # Detached CPU copies, so training can keep updating the live tensors
+  if torch.is_tensor(obj):
+    return obj.detach().to('cpu', copy=True)
+  if isinstance(obj, dict):
+    return type(obj)((key, _snapshot(value)) for key, value in obj.items())
+  if isinstance(obj, list):
+    return [_snapshot(value) for value in obj]
+  if isinstance(obj, tuple):
+    return tuple(_snapshot(value) for value in obj)
+  return copy.deepcopy(obj)
+
+def _get_rng_state():
+  state = {"python": random.getstate(), "numpy": np.random.get_state(), "torch": torch.get_rng_state()}
+  if torch.cuda.is_available():
+    state["cuda"] = torch.cuda.get_rng_state_all()
+  return state
+
+def _set_rng_state(state):
+  random.setstate(state["python"])
+  np.random.set_state(state["numpy"])
+  torch.set_rng_state(state["torch"])
+  if "cuda" in state and torch.cuda.is_available():
+    torch.cuda.set_rng_state_all(state["cuda"])
@@ -0,0 +1,90 @@
+# ---- Standard Lib Imports ----
+import os
+from pathlib import Path
+
+# ---- External Lib Imports ----
+from PIL import Image
+
+# ---- Local Lib Imports ----
+from .cachefiles import make_cache_name, read_json, write_json
+
+""" ---- Persistent Dataset Index ---- """
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.ppm', '.bmp', '.pgm', '.tif', '.tiff', '.webp')
+
+# Persistent listing of one input directory: relative path, size, mtime, label and (width, height)
+# of every image. Adding, removing or renaming a file updates its directory's mtime, so a refresh
+# only re-lists changed directories and otherwise costs one stat per directory, not per image.
+# labeled=True reads an ImageFolder layout, the top-level subdirectories name the classes.
+# labeled=False lists the images directly inside the directory, ex. for inference.
+class DatasetIndex(object):
+  def __init__(self, index_dirpath, root, labeled=True):
+    self.root = Path(root).resolve()
+    self.labeled = labeled
+    self.index_path = Path(index_dirpath) / (make_cache_name(self.root, 'labeled' if labeled else 'flat') + ".json")
+    self.directories = {}  # relative dirpath -> {"mtime", "subdirs", "files": {name: [size, mtime, width, height]}}
+
+  def refresh(self):
+    stored = read_json(self.index_path)
+    directories, modified = {}, False
+    pending = ["."]
+    while pending:
+      relative = pending.pop()
+      mtime = os.stat(self.root / relative).st_mtime_ns
+      entry = stored.get(relative)
+      if entry is None or entry["mtime"] != mtime:
+        entry = self._list_directory(relative, mtime, entry)
+        modified = True
+      directories[relative] = entry
+      if self.labeled:
+        pending.extend(os.path.normpath(os.path.join(relative, name)) for name in entry["subdirs"])
+    self.directories = directories
+    if modified or len(directories) != len(stored):
+      write_json(self.index_path, self.directories)
+    return self
+
+  def classes(self):
+    return list(self.directories["."]["subdirs"])
+
+  # (path, class index) in ImageFolder order
+  def samples(self):
+    return [(path, target) for path, target, _ in self.entries()]
+
+  # Images directly inside the root, sorted by name
+  def paths(self):
+    return [str(self.root / name) for name in sorted(self.directories["."]["files"])]
+
+  # (path, class index or None, [size, mtime, width, height]) of every indexed image
+  def entries(self):
+    if not self.labeled:
+      files = self.directories["."]["files"]
+      return [(str(self.root / name), None, files[name]) for name in sorted(files)]
+    entries = []
+    for target, class_name in enumerate(self.classes()):
+      relatives = sorted(relative for relative in self.directories if Path(relative).parts[:1] == (class_name,))
+      for relative in relatives:
+        files = self.directories[relative]["files"]
+        entries.extend((str(self.root / relative / name), target, files[name]) for name in sorted(files))
+    return entries
+
+  def _list_directory(self, relative, mtime, previous):
+    previous_files = previous["files"] if previous is not None else {}
+    files, subdirs = {}, []
+    with os.scandir(self.root / relative) as dir_entries:
+      for dir_entry in dir_entries:
+        if dir_entry.is_dir():
+          subdirs.append(dir_entry.name)
+        elif dir_entry.name.lower().endswith(IMAGE_EXTENSIONS):
+          stat = dir_entry.stat()
+          record = previous_files.get(dir_entry.name)
+          if record is None or record[:2] != [stat.st_size, stat.st_mtime_ns]:
+            record = [stat.st_size, stat.st_mtime_ns] + _read_dimensions(dir_entry.path)
+          files[dir_entry.name] = record
+    return {"mtime": mtime, "subdirs": sorted(subdirs), "files": files}
+
+def _read_dimensions(path):
+  # Only the image header is read
+  try:
+    with Image.open(path) as image:
+      return list(image.size)
+  except Exception:  # PIL raises OSError, SyntaxError, ValueError, DecompressionBombError...
+    return [None, None]
@@ -1,3 +1,12 @@
 from . import datamodule
 from . import inference
-from . import model
\ No newline at end of file
+from . import model
+from . import features
+from . import export
+from . import quantization
+from . import probe
+from . import memmap
+from . import tuning
+from . import augment
+from . import stats
+from . import shards
\ No newline at end of file
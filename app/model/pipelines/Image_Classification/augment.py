@@ -0,0 +1,33 @@
+# augment.py
+# Image Classification Batched Augmentation, runs on whole collated uint8 batches on the device
+import torch                                      # For tensor manipulation
+
+# Same as ToTensor + Normalize(mean, std) on each image
+def normalize_uint8(images, mean, std):
+  return _normalize(images.float().div_(255.0), mean, std)
+
+# Vectorized equivalents of the per-image train transforms: each image is flipped horizontally
+# and vertically with probability 0.5. jitter > 0 also scales brightness and contrast per image
+# by a factor in [1 - jitter, 1 + jitter]. Takes uint8 NCHW, returns normalized float NCHW.
+def augment_batch(images, mean, std, jitter=0.0):
+  num_images = images.shape[0]
+  hflip = torch.rand(num_images, device=images.device) < 0.5
+  vflip = torch.rand(num_images, device=images.device) < 0.5
+  images = torch.where(hflip.view(-1, 1, 1, 1), images.flip(3), images)
+  images = torch.where(vflip.view(-1, 1, 1, 1), images.flip(2), images)
+  images = images.float().div_(255.0)
+  if jitter > 0:
+    brightness = _uniform(num_images, jitter, images.device)
+    contrast = _uniform(num_images, jitter, images.device)
+    images = images * brightness
+    image_means = images.mean(dim=(1, 2, 3), keepdim=True)
+    images = ((images - image_means) * contrast + image_means).clamp_(0.0, 1.0)
+  return _normalize(images, mean, std)
+
+def _normalize(images, mean, std):
+  mean = torch.tensor(mean, dtype=images.dtype, device=images.device).view(1, -1, 1, 1)
+  std = torch.tensor(std, dtype=images.dtype, device=images.device).view(1, -1, 1, 1)
+  return images.sub_(mean).div_(std)
+
+def _uniform(num_images, jitter, device):
+  return torch.empty(num_images, 1, 1, 1, device=device).uniform_(1.0 - jitter, 1.0 + jitter)
@@ -1,14 +1,67 @@
 # datamodule.py 
 # Image Classification Data Preparation
+from functools import partial
+import torch                                      # For tensor dtypes
 from torchvision import datasets, transforms      # For dataset
-from torch.utils.data import DataLoader           # For dataloader
+from torch.utils.data import DataLoader, Sampler  # For dataloader, resumable shuffling
 from pytorch_lightning.core.datamodule import LightningDataModule  # For data module
+from .features import KeyedImageFolder            # For feature store keys
+from . import probe                               # For linear probe embeddings
+from . import augment                             # For batched augmentation
+from .stats import get_normalization              # For dataset mean / std
+from .memmap import build_memmap_cache, MemmapDataset  # For pre-decoded dataset cache
+from .shards import build_shards, ShardDataset    # For sequential tar shards
+from app.model.dataset_index import DatasetIndex, IMAGE_EXTENSIONS  # For persistent directory listings
+from app.model.runtime import load_image          # For reduced-resolution decoding
+
+# Shared shuffle state of the train sampler, moved by the resumable training checkpoints
+class SamplerPosition(object):
+  def __init__(self):
+    self.epoch = 0
+    self.skip_epoch = None  # Epoch resumed mid-way
+    self.skip_samples = 0   # Samples of that epoch already trained on
+
+# Shuffles with a permutation derived from (seed, epoch), so a resumed run can reproduce
+# the interrupted epoch's order and skip the samples it already trained on.
+class ResumableRandomSampler(Sampler):
+  def __init__(self, num_samples, seed, position):
+    self.num_samples = num_samples
+    self.seed = seed
+    self.position = position
+
+  def __iter__(self):
+    generator = torch.Generator()
+    generator.manual_seed(self.seed + self.position.epoch)
+    order = torch.randperm(self.num_samples, generator=generator).tolist()
+    if self.position.skip_epoch == self.position.epoch:
+      order = order[self.position.skip_samples:]
+      self.position.skip_epoch = None
+    return iter(order)
+
+  def __len__(self):
+    return self.num_samples
+
+# ImageFolder built from a dataset index instead of walking the directory tree
+class IndexedImageFolder(datasets.ImageFolder):
+  def __init__(self, index, transform=None, loader=load_image):
+    datasets.VisionDataset.__init__(self, str(index.root), transform=transform)
+    self.loader = loader
+    self.extensions = IMAGE_EXTENSIONS
+    self.classes = index.classes()
+    self.class_to_idx = {class_name: target for target, class_name in enumerate(self.classes)}
+    self.samples = index.samples()
+    self.targets = [target for _, target in self.samples]
+    self.imgs = self.samples
 
 class DataModule(LightningDataModule):
-  def __init__(self, hparams):
+  def __init__(self, hparams, cache_dirpath=None, index_dirpath=None):
     super().__init__()
     # Store arguments
     self.hparams = hparams
+    self.cache_dirpath = cache_dirpath  # Pre-decoded datasets, see --dataset_format
+    self.index_dirpath = index_dirpath  # Persistent directory listings, None walks the folders
+    self.sampler_position = SamplerPosition()
+    self.mean, self.std = get_normalization(self.hparams)  # Dataset statistics, see --normalize
 
     # Define transforms
     self.transform = { 
@@ -17,13 +70,51 @@ class DataModule(LightningDataModule):
           transforms.RandomHorizontalFlip(),
           transforms.RandomVerticalFlip(),
           transforms.ToTensor(), # This also auto-normalizes to range [0, 1]
-          transforms.Normalize(mean=(0.5,0.5,0.5), std=(0.5,0.5,0.5)) # Assuming Gaussian
+          transforms.Normalize(mean=self.mean, std=self.std)
       ]),
       'val': transforms.Compose([
           transforms.Resize([self.hparams['length'], self.hparams['width']]),
           transforms.ToTensor(),
-          transforms.Normalize(mean=(0.5, 0.5, 0.5), std=(0.5,0.5,0.5))                      
-      ])
+          transforms.Normalize(mean=self.mean, std=self.std)
+      ]),
+      # Memmap cached images are already resized uint8 tensors
+      'memmap_train': transforms.Compose([
+          transforms.RandomHorizontalFlip(),
+          transforms.RandomVerticalFlip(),
+          transforms.ConvertImageDtype(torch.float),
+          transforms.Normalize(mean=self.mean, std=self.std)
+      ]),
+      'memmap_val': transforms.Compose([
+          transforms.ConvertImageDtype(torch.float),
+          transforms.Normalize(mean=self.mean, std=self.std)
+      ]),
+      # --fast_loader hands uint8 batches over, normalized on the device in on_after_batch_transfer
+      'fast_train': transforms.Compose([
+          transforms.Resize([self.hparams['length'], self.hparams['width']]), 
+          transforms.RandomHorizontalFlip(),
+          transforms.RandomVerticalFlip(),
+          transforms.PILToTensor()
+      ]),
+      'fast_val': transforms.Compose([
+          transforms.Resize([self.hparams['length'], self.hparams['width']]),
+          transforms.PILToTensor()
+      ]),
+      'fast_memmap_train': transforms.Compose([
+          transforms.RandomHorizontalFlip(),
+          transforms.RandomVerticalFlip()
+      ]),
+      'fast_memmap_val': None,
+      # --augment batch flips whole batches on the device, workers only decode and resize
+      'batch_train': transforms.Compose([
+          transforms.Resize([self.hparams['length'], self.hparams['width']]), 
+          transforms.PILToTensor()
+      ]),
+      'batch_val': transforms.Compose([
+          transforms.Resize([self.hparams['length'], self.hparams['width']]),
+          transforms.PILToTensor()
+      ]),
+      'batch_memmap_train': None,
+      'batch_memmap_val': None
     }
     
   # Download and split data here, (nothing in this local-data, split case)
@@ -31,19 +122,105 @@ class DataModule(LightningDataModule):
   
   # Make datasets
   def setup(self, stage = None): 
-    self.train_data = datasets.ImageFolder(root=self.hparams['input_dirpath'] + '/train', transform=self.transform['train'])
-    self.val_data = datasets.ImageFolder(root=self.hparams['input_dirpath'] + '/valid', transform=self.transform['val']) 
+    if self.hparams.get('feature_store'):
+      # Same preprocessing as the transforms, but batches also carry the image keys
+      image_size = (self.hparams['length'], self.hparams['width'])
+      self.train_data = KeyedImageFolder(self.hparams['input_dirpath'] + '/train', *image_size, 
+                                         mean=self.mean, std=self.std, random_flips=True)
+      self.val_data = KeyedImageFolder(self.hparams['input_dirpath'] + '/valid', *image_size, 
+                                       mean=self.mean, std=self.std)
+    elif self.hparams.get('dataset_format') == 'memmap':
+      # Decode and resize once, epochs then read uint8 slices of the cache
+      image_size = (self.hparams['length'], self.hparams['width'])
+      train_cache = build_memmap_cache(self.hparams['input_dirpath'] + '/train', self.cache_dirpath, *image_size, 
+                                       num_workers=self.hparams['num_workers'], folder=self._make_folder('train'))
+      val_cache = build_memmap_cache(self.hparams['input_dirpath'] + '/valid', self.cache_dirpath, *image_size, 
+                                     num_workers=self.hparams['num_workers'], folder=self._make_folder('valid'))
+      self.train_data = MemmapDataset(train_cache, transform=self.transform[self._transform_key('memmap_train')])
+      self.val_data = MemmapDataset(val_cache, transform=self.transform[self._transform_key('memmap_val')])
+    elif self.hparams.get('dataset_format') == 'shards':
+      # Pack once, epochs then stream large files instead of opening every image
+      decode_size = (self.hparams['length'], self.hparams['width'])
+      train_shards = build_shards(self.hparams['input_dirpath'] + '/train', self.cache_dirpath, folder=self._make_folder('train'))
+      val_shards = build_shards(self.hparams['input_dirpath'] + '/valid', self.cache_dirpath, folder=self._make_folder('valid'))
+      self.train_data = ShardDataset(train_shards, transform=self.transform[self._transform_key('train')], decode_size=decode_size, 
+                                     shuffle=True, shuffle_buffer=self.hparams.get('shuffle_buffer', 1000))
+      self.val_data = ShardDataset(val_shards, transform=self.transform[self._transform_key('val')], decode_size=decode_size)
+    else:
+      self.train_data = self._make_folder('train', transform=self.transform[self._transform_key('train')])
+      self.val_data = self._make_folder('valid', transform=self.transform[self._transform_key('val')]) 
 
     self.class_mapping = self.train_data.class_to_idx  # To pass to inference
+    self.embeddings = {}
 
   # Make dataloaders
   def train_dataloader(self): 
+    if self.hparams.get('linear_probe'):
+      views = probe.PROBE_VIEWS[:max(1, self.hparams.get('probe_views', 1))]
+      embeddings = self._get_embeddings('train', views)
+      return DataLoader(dataset=embeddings, batch_size=self.hparams['batch_size'], 
+                        sampler=self._make_train_sampler(embeddings))
+    if isinstance(self.train_data, ShardDataset):
+      # Shuffled by the dataset itself, shard order and shuffle buffer
+      return DataLoader(dataset=self.train_data, batch_size=self.hparams['batch_size'], **self._loader_args('num_workers'))
     return DataLoader(dataset=self.train_data, batch_size=self.hparams['batch_size'], 
-                      shuffle=True, num_workers=self.hparams['num_workers'])
+                      sampler=self._make_train_sampler(self.train_data), **self._loader_args('num_workers'))
 
   def val_dataloader(self):
+    if self.hparams.get('linear_probe'):
+      return DataLoader(dataset=self._get_embeddings('valid', probe.PROBE_VIEWS[:1]), 
+                        batch_size=self.hparams['batch_size'], shuffle=False)
     return DataLoader(dataset=self.val_data, batch_size=self.hparams['batch_size'], 
-                      shuffle=False, num_workers=1)
+                      shuffle=False, **self._loader_args('val_num_workers'))
+
+  # Finishes uint8 batches on the device, one vectorized op instead of one per image
+  def on_after_batch_transfer(self, batch, *args):
+    images = batch[0]
+    if not (torch.is_tensor(images) and images.dtype == torch.uint8):
+      return batch
+    if self.hparams.get('augment') == 'batch' and self.trainer.lightning_module.training:
+      images = augment.augment_batch(images, self.mean, self.std, jitter=self.hparams.get('augment_jitter', 0.0))
+    else:
+      images = augment.normalize_uint8(images, self.mean, self.std)
+    return [images] + list(batch[1:])
+
+  def _make_folder(self, split, transform=None):
+    root = self.hparams['input_dirpath'] + '/' + split
+    # JPEGs decode close to the resize target instead of at full resolution
+    loader = partial(load_image, size=(self.hparams['length'], self.hparams['width']))
+    if self.index_dirpath is None:
+      return datasets.ImageFolder(root=root, transform=transform, loader=loader)
+    return IndexedImageFolder(DatasetIndex(self.index_dirpath, root).refresh(), transform=transform, loader=loader)
+
+  def _transform_key(self, name):
+    if self.hparams.get('augment') == 'batch':
+      return 'batch_' + name
+    return 'fast_' + name if self.hparams.get('fast_loader') else name
+
+  def _loader_args(self, workers_key):
+    num_workers = self.hparams.get(workers_key, 1)
+    fast_loader = bool(self.hparams.get('fast_loader'))
+    # Page-locked batches copy to the GPU asynchronously
+    args = {"num_workers": num_workers, "pin_memory": fast_loader and torch.cuda.is_available()}
+    if num_workers == 0:
+      return args
+    # Persistent workers skip the per-epoch worker startup. Workers already collate batches
+    # straight into shared memory, uint8 batches make those buffers 4x smaller.
+    args.update({"prefetch_factor": self.hparams.get('prefetch_factor', 2),
+                 "persistent_workers": fast_loader or bool(self.hparams.get('persistent_workers'))})
+    return args
+
+  def _make_train_sampler(self, dataset):
+    return ResumableRandomSampler(len(dataset), self.hparams.get('shuffle_seed', 0), self.sampler_position)
+
+  # Embedded once per run, dataloaders are requested after the model is on its device
+  def _get_embeddings(self, split, views):
+    if split not in self.embeddings:
+      self.embeddings[split] = probe.extract_embeddings(
+        self.trainer.lightning_module, self.hparams['input_dirpath'] + '/' + split, 
+        self.hparams['length'], self.hparams['width'], mean=self.mean, std=self.std, views=views, 
+        batch_size=self.hparams['batch_size'], num_workers=self.hparams['num_workers'])
+    return self.embeddings[split]
   
   # Define default parameters
   @staticmethod
@@ -53,4 +230,18 @@ class DataModule(LightningDataModule):
     parser.add_argument('--width', type=int, default=224)
     parser.add_argument('--batch_size', type=int, default=32)
     parser.add_argument('--num_workers', type=int, default=2)
+    parser.add_argument('--val_num_workers', type=int, default=1)
+    parser.add_argument('--prefetch_factor', type=int, default=2, help='Batches loaded ahead per worker')
+    parser.add_argument('--persistent_workers', action='store_true', help='Keep loader workers alive between epochs')
+    parser.add_argument('--normalize', type=str, default='dataset', choices=['dataset', 'fixed'], help='dataset measures the train images mean / std before training, fixed uses 0.5 / 0.5')
+    parser.add_argument('--fast_loader', action='store_true', help='Persistent workers, uint8 batches normalized on the device, pinned memory on GPU')
+    parser.add_argument('--augment', type=str, default='sample', choices=['sample', 'batch'], help='batch flips whole uint8 batches on the device instead of each image in the workers')
+    parser.add_argument('--augment_jitter', type=float, default=0.0, help='Brightness / contrast jitter strength with --augment batch, 0 disables')
+    parser.add_argument('--num_threads', type=int, default=0, help='Torch intra-op threads, 0 keeps the default. Process executor only')
+    parser.add_argument('--auto_tune', action='store_true', help='Calibrate threads, workers and prefetching on this machine and dataset')
+    parser.add_argument('--shuffle_seed', type=int, default=0, help='Seed of the per-epoch train shuffle order')
+    parser.add_argument('--dataset_format', type=str, default='folder', choices=['folder', 'memmap', 'shards'], help='memmap decodes images once into a uint8 cache, shards packs images into large tar files')
+    parser.add_argument('--shuffle_buffer', type=int, default=1000, help='Images mixed at once with --dataset_format shards')
+    parser.add_argument('--linear_probe', action='store_true', help='Embed images once per run, then train the head on in-memory features')
+    parser.add_argument('--probe_views', type=int, default=1, help='Flip views embedded per train image with --linear_probe, up to 4')
     return parent_parser
\ No newline at end of file
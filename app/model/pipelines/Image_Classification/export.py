@@ -0,0 +1,43 @@
+# export.py
+# Image Classification TorchScript Export
+import json
+from pathlib import Path
+import torch                                      # For tracing
+from torch import nn                              # For export wrapper
+
+from .model import Model
+from .stats import get_normalization
+from app.model.runtime import TORCHSCRIPT_FILENAME, TORCHSCRIPT_METADATA
+
+# Backbone + head with the preprocessing constants embedded as buffers.
+# Takes uint8 NCHW images at the trained resolution, same math as ToTensor + Normalize.
+class ExportedClassifier(nn.Module):
+  def __init__(self, feature_extractor, classifer, mean, std):
+    super().__init__()
+    self.feature_extractor = feature_extractor
+    self.classifer = classifer
+    self.register_buffer('mean', torch.tensor(mean).view(1, 3, 1, 1))
+    self.register_buffer('std', torch.tensor(std).view(1, 3, 1, 1))
+
+  def forward(self, x):
+    x = (x.float() / 255.0 - self.mean) / self.std
+    return self.classifer(self.feature_extractor(x).flatten(1))
+
+def export_torchscript(ckpt_file, class_mapping, output_dirpath):
+  model = Model.load_from_checkpoint(checkpoint_path=str(ckpt_file))
+  model.eval()
+  mean, std = get_normalization(model.hparams)
+  length, width = model.hparams['length'], model.hparams['width']
+  wrapper = ExportedClassifier(model.feature_extractor, model.classifer, mean, std).eval()
+
+  # Trace, then freeze weights into constants so the graph can be folded at load time
+  example = torch.zeros(1, 3, length, width, dtype=torch.uint8)
+  with torch.no_grad():
+    scripted = torch.jit.trace(wrapper, example)
+    scripted = torch.jit.freeze(scripted)
+
+  metadata = {"class_mapping": class_mapping, "length": length, "width": width,
+              "mean": list(mean), "std": list(std)}
+  artifact_path = Path(output_dirpath) / TORCHSCRIPT_FILENAME
+  torch.jit.save(scripted, str(artifact_path), _extra_files={TORCHSCRIPT_METADATA: json.dumps(metadata)})
+  return artifact_path
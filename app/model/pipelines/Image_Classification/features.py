@@ -0,0 +1,120 @@
+# features.py
+# Image Classification Feature Store
+import io
+import time
+import sqlite3
+import threading
+from pathlib import Path
+import numpy as np
+from PIL import Image
+import torch                                      # For tensor manipulation
+from torchvision import datasets, transforms      # For dataset
+from app.model.runtime import hash_bytes, load_image  # For image content keys, reduced-resolution decoding
+
+# Persistent on-disk store of frozen backbone embeddings, shared across epochs, runs and inference.
+# Entries are keyed by namespace (backbone, input resolution, normalization) and image content hash,
+# so a cache hit only needs the linear head. Least recently used entries are evicted past max_bytes.
+class FeatureStore(object):
+  def __init__(self, db_path, namespace, max_bytes):
+    self.namespace = namespace
+    self.max_bytes = max_bytes
+    self.lock = threading.Lock()
+    Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+    self.connection = sqlite3.connect(str(db_path), check_same_thread=False)
+    self.connection.execute("CREATE TABLE IF NOT EXISTS features "
+                            "(key TEXT PRIMARY KEY, value BLOB, nbytes INTEGER, last_access REAL)")
+    self.connection.execute("CREATE INDEX IF NOT EXISTS features_last_access ON features (last_access)")
+    self.connection.commit()
+    self.total_bytes = self.connection.execute("SELECT COALESCE(SUM(nbytes), 0) FROM features").fetchone()[0]
+
+  def get_or_compute(self, keys, compute, device):
+    # compute(indices) runs the backbone on the uncached images of the batch
+    store_keys = [self.namespace + "|" + key for key in keys]
+    cached = self.get_many(store_keys)
+    missing = [index for index, key in enumerate(store_keys) if key not in cached]
+    computed = compute(missing) if missing else None
+
+    features = [None] * len(keys)
+    for index, key in enumerate(store_keys):
+      if key in cached:
+        features[index] = torch.from_numpy(cached[key])
+    if computed is not None:
+      for position, index in enumerate(missing):
+        features[index] = computed[position]
+      self.put_many({store_keys[index]: computed[position] for position, index in enumerate(missing)})
+    return torch.stack([feature.to(device) for feature in features])
+
+  def get_many(self, store_keys):
+    found = {}
+    with self.lock:
+      for start in range(0, len(store_keys), 500):  # SQLite limits bound parameters per query
+        chunk = store_keys[start:start + 500]
+        placeholders = ",".join("?" * len(chunk))
+        rows = self.connection.execute(f"SELECT key, value FROM features WHERE key IN ({placeholders})", chunk)
+        for key, value in rows:
+          found[key] = np.frombuffer(value, dtype=np.float32).copy()
+        self.connection.execute(f"UPDATE features SET last_access = ? WHERE key IN ({placeholders})",
+                                [time.time()] + chunk)
+      self.connection.commit()
+    return found
+
+  def put_many(self, items):
+    now = time.time()
+    rows = []
+    for key, feature in items.items():
+      value = feature.detach().cpu().numpy().astype(np.float32).tobytes()
+      rows.append((key, value, len(value), now))
+    with self.lock:
+      self.connection.executemany("INSERT OR REPLACE INTO features VALUES (?, ?, ?, ?)", rows)
+      self.total_bytes += sum(row[2] for row in rows)
+      self._evict()
+      self.connection.commit()
+
+  def _evict(self):
+    # Trim to 90% of the limit, so eviction does not run on every insert
+    if self.total_bytes <= self.max_bytes:
+      return
+    self.total_bytes = self.connection.execute("SELECT COALESCE(SUM(nbytes), 0) FROM features").fetchone()[0]
+    while self.total_bytes > 0.9 * self.max_bytes:
+      rows = self.connection.execute("SELECT key, nbytes FROM features ORDER BY last_access LIMIT 1000").fetchall()
+      if not rows:
+        break
+      self.connection.executemany("DELETE FROM features WHERE key = ?", [(key,) for key, _ in rows])
+      self.total_bytes -= sum(nbytes for _, nbytes in rows)
+
+def make_namespace(backbone, length, width, mean, std):
+  # Embeddings are only reusable for the same backbone and identical preprocessing
+  return f"{backbone}|{length}x{width}|mean={tuple(mean)}|std={tuple(std)}|decode=draft"
+
+# ImageFolder that also returns a feature store key: image content hash plus the applied flips.
+# Flips are sampled explicitly, so each of the four augmented views is cached separately.
+# flips=(hflip, vflip) renders one fixed view instead, ex. for linear probe embeddings.
+class KeyedImageFolder(datasets.ImageFolder):
+  def __init__(self, root, length, width, mean, std, random_flips=False, flips=None):
+    super().__init__(root=root)
+    self.decode_size = (length, width)
+    self.resize = transforms.Resize([length, width])
+    self.to_tensor = transforms.Compose([
+      transforms.ToTensor(),
+      transforms.Normalize(mean=mean, std=std)
+    ])
+    self.random_flips = random_flips
+    self.flips = flips
+
+  def __getitem__(self, index):
+    path, target = self.samples[index]
+    with open(path, 'rb') as file:
+      data = file.read()
+    img = load_image(io.BytesIO(data), self.decode_size)
+    img = self.resize(img)
+    hflip, vflip = False, False
+    if self.flips is not None:
+      hflip, vflip = self.flips
+    elif self.random_flips:
+      hflip, vflip = (torch.rand(2) < 0.5).tolist()
+    if hflip:
+      img = img.transpose(Image.FLIP_LEFT_RIGHT)
+    if vflip:
+      img = img.transpose(Image.FLIP_TOP_BOTTOM)
+    view = f"h{int(hflip)}v{int(vflip)}"
+    return self.to_tensor(img), target, hash_bytes(data) + "|" + view
@@ -1,57 +1,39 @@
 # inference.py 
 # Image Classification Inference 
-from pathlib import Path
-from PIL import Image
-import torch                                # For tensor manipulation
 from torchvision import transforms          # For pre-processing 
-from torch.nn import functional as F        # For final softmax activation
 
 # ML Models are weights + code! When loading in ckpt, need the model as well.
 from .model import Model
+from .stats import get_normalization
+from app.model.runtime import Predictor
 
-class Inference(object):
-  def __init__(self, class_mapping, params):
-    self.class_mapping = class_mapping
+class Inference(Predictor):
+  def __init__(self, class_mapping, params, batch_size=None, num_workers=0, top_k=3, device="cpu"):
     self.hparams = params
+    batch_size = batch_size if batch_size is not None else self.hparams.get('batch_size', 32)
+    super().__init__(class_mapping, batch_size=batch_size, num_workers=num_workers, top_k=top_k, device=device)
+    mean, std = get_normalization(self.hparams)
+    self.decode_size = (self.hparams['length'], self.hparams['width'])
     self.transform = transforms.Compose([ 
                       transforms.Resize([self.hparams['length'], self.hparams['width']]),
                       transforms.ToTensor(),
-                      transforms.Normalize(mean=(0.5, 0.5, 0.5), std=(0.5,0.5,0.5))
+                      transforms.Normalize(mean=mean, std=std)
                     ])
 
-  def __call__(self, data_path, ckpt_path):
-    model = self._load_model(ckpt_path)
-    image_dict = self._load_PIL(data_path)
-    output = model(image_dict['tensors'])
-    labels = self._translate_output(output)
-    return {"PIL_Images": image_dict['PIL_Images'], "labels": labels}
+  # Loaded model is kept on the instance, so a cached Inference skips the reload
+  def load(self, ckpt_path):
+    self.model = self._load_model(ckpt_path)
+    return self
 
   # Utilities 
   def _load_model(self, ckpt_path): 
-    model = Model.load_from_checkpoint(checkpoint_path=ckpt_path)
+    model = Model.load_from_checkpoint(checkpoint_path=ckpt_path, map_location=self.device)
+    model.to(self.device)
     model.eval()
     return model
 
-  def _load_PIL(self, data_path): 
-    basepath = Path(data_path)
-    file_objs = basepath.iterdir()
-    images = []
-    batch_tensors = []
-    for obj in file_objs:
-      # Load & Transform 
-      img = Image.open(basepath / obj.name)
-      img = img.convert('RGB')
-      tensor = self.transform(img)
-      # Store
-      images.append(img)
-      batch_tensors.append(tensor)
-    return {"PIL_Images": images, "tensors": torch.stack(batch_tensors)}
+  def _forward(self, tensors, keys):
+    return self.model(tensors, keys)
 
-  def _translate_output(self, one_hot_output):
-    class_names = []
-    for vector in one_hot_output:
-      vector = F.softmax(vector, dim=0)  # Map logits onto [0, 1] range
-      id = torch.argmax(vector).item()   # Get index of maximum value
-      class_name = list(self.class_mapping.items())[id][0]   # Get corresponding class name at index
-      class_names.append(class_name)     # Generate the output
-    return class_names
\ No newline at end of file
+  def _with_keys(self):
+    return self.model.feature_store is not None
@@ -0,0 +1,93 @@
+# memmap.py
+# Image Classification Pre-Decoded Dataset Cache
+import json
+from pathlib import Path
+from functools import partial
+import numpy as np
+import torch                                      # For tensor manipulation
+from torchvision import datasets, transforms      # For folder listing, resizing
+from torch.utils.data import Dataset, DataLoader  # For parallel decoding
+from app.model.runtime import load_image          # For reduced-resolution decoding
+from app.model.cachefiles import make_cache_name, make_signature, build_directory, open_build  # For cache building
+
+MEMMAP_METADATA = "meta.json"
+MEMMAP_LABELS = "labels.npy"
+
+# Decodes and resizes an ImageFolder split once into uint8 HWC memmap shards plus a label array.
+# The cache is rebuilt when any image of the split is added, removed or modified.
+# folder is an already listed ImageFolder of root, ex. from a dataset index.
+def build_memmap_cache(root, cache_dirpath, length, width, shard_size=4096, num_workers=0, folder=None):
+  folder = folder if folder is not None else datasets.ImageFolder(root=root, loader=partial(load_image, size=(length, width)))
+  cache_path = Path(cache_dirpath) / make_cache_name(Path(root).resolve(), f"{length}x{width}")
+  signature = make_signature(folder.samples)
+  return build_directory(cache_path, signature, partial(_build, folder, signature, length, width, shard_size, num_workers))
+
+def _build(folder, signature, length, width, shard_size, num_workers, tmp_path):
+  folder.transform = transforms.Compose([transforms.Resize([length, width]), np.array])
+  loader = DataLoader(dataset=folder, batch_size=64, shuffle=False, num_workers=num_workers)
+  num_images = len(folder)
+  shard, shard_index, offset = None, -1, 0
+  for images, _ in loader:
+    for image in images.numpy():
+      if offset // shard_size != shard_index:
+        if shard is not None:
+          shard.flush()
+        shard_index = offset // shard_size
+        count = min(shard_size, num_images - shard_index * shard_size)
+        shard = np.lib.format.open_memmap(str(tmp_path / _shard_filename(shard_index)), mode='w+',
+                                          dtype=np.uint8, shape=(count, length, width, 3))
+      shard[offset % shard_size] = image
+      offset += 1
+  if shard is not None:
+    shard.flush()
+    del shard
+  np.save(tmp_path / MEMMAP_LABELS, np.array(folder.targets, dtype=np.int64))
+  with open(tmp_path / MEMMAP_METADATA, 'w') as file:
+    json.dump({"signature": signature, "num_images": num_images, "shard_size": shard_size,
+               "length": length, "width": width, "classes": folder.classes,
+               "class_to_idx": folder.class_to_idx}, file)
+
+# Reads images as zero-copy slices of the memmap shards, transform receives uint8 CHW tensors.
+# Shards are opened lazily, so each DataLoader worker maps its own view of the files.
+class MemmapDataset(Dataset):
+  def __init__(self, cache_path, transform=None):
+    self.cache_path = Path(cache_path)
+    with open(self.cache_path / MEMMAP_METADATA) as file:
+      metadata = json.load(file)
+    self.shard_size = metadata["shard_size"]
+    self.classes = metadata["classes"]
+    self.class_to_idx = metadata["class_to_idx"]
+    self.targets = np.load(self.cache_path / MEMMAP_LABELS)
+    self.transform = transform
+    self.shards = None
+    self.in_use = open_build(self.cache_path)  # Kept from deletion by newer builds while loaded
+
+  def __getstate__(self):
+    # Loader workers are covered by the process that created the dataset
+    state = dict(self.__dict__)
+    state['in_use'] = None
+    return state
+
+  def __len__(self):
+    return len(self.targets)
+
+  def __getitem__(self, index):
+    if self.shards is None:
+      num_shards = -(-len(self.targets) // self.shard_size)
+      # Copy-on-write mapping, writable for torch.from_numpy but never written back
+      self.shards = [np.load(self.cache_path / _shard_filename(shard_index), mmap_mode='c')
+                     for shard_index in range(num_shards)]
+    image = self.shards[index // self.shard_size][index % self.shard_size]
+    image = torch.from_numpy(image).permute(2, 0, 1)
+    if self.transform is not None:
+      image = self.transform(image)
+    return image, int(self.targets[index])
+
+  def __getstate__(self):
+    # Memory maps are not sent to worker processes, each worker reopens them
+    state = self.__dict__.copy()
+    state["shards"] = None
+    return state
+
+def _shard_filename(shard_index):
+  return f"shard_{shard_index:04d}.npy"
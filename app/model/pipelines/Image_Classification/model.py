@@ -6,6 +6,8 @@ from torch.nn import functional as F              # For loss, activation functio
 import torchvision.models as models               # For transfer learning
 import torchmetrics                               # For metrics 
 from pytorch_lightning.core.lightning import LightningModule  # For model
+from .features import FeatureStore, make_namespace                # For embedding cache
+from .stats import get_normalization              # For dataset mean / std
 
 # Transfer Learning with ResNet50 feature extractor. 
 # Head replaced with n-node fc layer with softmax activation.
@@ -27,22 +29,54 @@ class Model(LightningModule):
     self.train_acc = torchmetrics.Accuracy()
     self.valid_acc = torchmetrics.Accuracy()
 
-  def forward(self, x):
-    # Use Resnet backbone
-    self.feature_extractor.eval() 
-    with torch.no_grad():
-      representations = self.feature_extractor(x).flatten(1)
+    # Persistent embedding cache, attached by the model api when enabled
+    self.feature_store = None
+
+  def forward(self, x, keys=None):
+    # Linear probe batches are already embeddings, images go through the backbone
+    representations = x if x.dim() == 2 else self.embed(x, keys)
 
     # Learn head
     x = self.classifer(representations) 
     return x  
 
+  def embed(self, x, keys=None):
+    # Use Resnet backbone, or stored embeddings of images seen before
+    if self.feature_store is not None and keys is not None:
+      return self.feature_store.get_or_compute(keys, lambda indices: self._extract_features(x[indices]), 
+                                               device=x.device)
+    return self._extract_features(x)
+
+  def _extract_features(self, x):
+    self.feature_extractor.eval() 
+    with torch.no_grad():
+      return self.feature_extractor(x).flatten(1)
+
+  def attach_feature_store(self, db_path, max_bytes):
+    mean, std = get_normalization(self.hparams)
+    namespace = make_namespace("resnet50-imagenet", self.hparams['length'], self.hparams['width'], mean, std)
+    self.feature_store = FeatureStore(db_path, namespace, max_bytes)
+
   def configure_optimizers(self):
-    return torch.optim.Adam(self.parameters(), self.hparams['lr'])
+    optimizer = torch.optim.Adam(self.parameters(), self.hparams['lr'])
+    scheduler = self.hparams.get('scheduler', 'none')
+    if scheduler == 'plateau':
+      # Lower the learning rate once val_acc stops improving
+      plateau = torch.optim.lr_scheduler.ReduceLROnPlateau(optimizer, mode='max', factor=self.hparams['lr_factor'], 
+                                                           patience=self.hparams['lr_patience'])
+      return {"optimizer": optimizer, "lr_scheduler": {"scheduler": plateau, "monitor": "val_acc"}}
+    if scheduler == 'onecycle':
+      # Warm up to --lr then anneal, stepped per optimizer step over the whole run
+      num_batches = len(self.trainer.datamodule.train_dataloader())
+      steps_per_epoch = -(-num_batches // self.trainer.accumulate_grad_batches)
+      onecycle = torch.optim.lr_scheduler.OneCycleLR(optimizer, max_lr=self.hparams['lr'], 
+                                                     epochs=self.trainer.max_epochs, steps_per_epoch=steps_per_epoch)
+      return {"optimizer": optimizer, "lr_scheduler": {"scheduler": onecycle, "interval": "step"}}
+    return optimizer
 
   def training_step(self, batch, batch_idx):
-    x, y = batch 
-    logits = self(x)
+    x, y, keys = self._unpack(batch)
+    logits = self(x, keys)
     loss = F.cross_entropy(logits, y) # One hot encoding, log_softmax interally
     preds = F.softmax(logits, dim=1)
     self.train_acc(preds, y)
@@ -52,8 +86,8 @@ class Model(LightningModule):
     return loss  # Mandatory
 
   def validation_step(self, batch, batch_idx):
-    x, y = batch 
-    logits = self(x)
+    x, y, keys = self._unpack(batch)
+    logits = self(x, keys)
     loss = F.cross_entropy(logits, y)
     preds = F.softmax(logits, dim=1)
     self.valid_acc(preds, y)
@@ -61,9 +95,22 @@ class Model(LightningModule):
     self.log('val_loss', loss)
     self.log('val_acc', self.valid_acc)
 
+  def _unpack(self, batch):
+    # Feature store datasets append the image keys to each batch
+    if len(batch) == 3:
+      return batch
+    x, y = batch
+    return x, y, None
+
   # Define default parameters
   @staticmethod
   def add_model_specific_args(parent_parser):
     parser = parent_parser.add_argument_group('Model Params')
     parser.add_argument('--lr', type=float, default=1e-3, help='Learning Rate, typical range [0.1 - 1e-5]')
+    parser.add_argument('--feature_store', action='store_true', help='Reuse stored backbone embeddings across epochs, runs and inference')
+    parser.add_argument('--scheduler', type=str, default='none', choices=['none', 'plateau', 'onecycle'], help='Learning rate schedule')
+    parser.add_argument('--lr_patience', type=int, default=2, help='Epochs without val_acc improvement before plateau lowers the lr')
+    parser.add_argument('--lr_factor', type=float, default=0.1, help='Plateau lr multiplier')
+    parser.add_argument('--early_stop_patience', type=int, default=0, help='Stop after this many epochs without val_acc improvement, 0 disables')
+    parser.add_argument('--early_stop_min_delta', type=float, default=0.0, help='Smallest val_acc gain that counts as an improvement')
     return parent_parser
\ No newline at end of file
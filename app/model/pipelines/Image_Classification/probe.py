@@ -0,0 +1,19 @@
+# probe.py
+# Image Classification Linear Probe, the frozen backbone embeds each image once per run
+import torch                                      # For tensor manipulation
+from torch.utils.data import DataLoader, TensorDataset  # For in-memory embeddings
+from .features import KeyedImageFolder            # For fixed flip views
+
+# (hflip, vflip) views of the train augmentation, --probe_views n embeds the first n
+PROBE_VIEWS = [(False, False), (True, False), (False, True), (True, True)]
+
+def extract_embeddings(model, root, length, width, mean, std, views, batch_size, num_workers):
+  # One backbone pass per view, every epoch after that only runs the linear head
+  features, targets = [], []
+  for flips in views:
+    dataset = KeyedImageFolder(root, length, width, mean=mean, std=std, flips=flips)
+    loader = DataLoader(dataset=dataset, batch_size=batch_size, shuffle=False, num_workers=num_workers)
+    for x, y, keys in loader:
+      features.append(model.embed(x.to(model.device), list(keys)).cpu())
+      targets.append(y)
+  return TensorDataset(torch.cat(features), torch.cat(targets))
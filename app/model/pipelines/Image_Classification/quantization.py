@@ -0,0 +1,92 @@
+# quantization.py
+# Image Classification INT8 Post-Training Quantization
+import json
+import time
+import random
+from pathlib import Path
+import torch                                      # For quantization
+from torch import nn                              # For quantized head
+import torchvision.models.quantization as quantized_models  # For quantizable ResNet50
+from torchvision import transforms                # For calibration pre-processing
+
+from .model import Model
+from .export import ExportedClassifier
+from .stats import get_normalization
+from app.model.runtime import ScriptedInference, TORCHSCRIPT_METADATA, INT8_TORCHSCRIPT_FILENAME, load_image
+
+# Names of the ResNet50 children kept in Model.feature_extractor, in order
+RESNET_CHILDREN = ['conv1', 'bn1', 'relu', 'maxpool', 'layer1', 'layer2', 'layer3', 'layer4', 'avgpool']
+
+def quantize_torchscript(ckpt_file, class_mapping, output_dirpath, calibration_paths):
+  # Static quantization of the backbone, calibrated on sample images, plus dynamic quantization of the head
+  model = Model.load_from_checkpoint(checkpoint_path=str(ckpt_file))
+  model.eval()
+  mean, std = get_normalization(model.hparams)
+  length, width = model.hparams['length'], model.hparams['width']
+  _select_engine()
+
+  # Rebuild the backbone as a quantizable ResNet50 (quant/dequant stubs, fusable blocks)
+  backbone = quantized_models.resnet50(pretrained=False, quantize=False)
+  backbone.fc = nn.Identity()
+  state_dict = {}
+  for key, value in model.feature_extractor.state_dict().items():
+    index, name = key.split('.', 1)
+    state_dict[RESNET_CHILDREN[int(index)] + '.' + name] = value
+  backbone.load_state_dict(state_dict)
+  backbone.eval()
+  backbone.fuse_model()
+  backbone.qconfig = torch.quantization.get_default_qconfig(torch.backends.quantized.engine)
+  torch.quantization.prepare(backbone, inplace=True)
+
+  # Calibrate activation ranges
+  transform = transforms.Compose([
+                transforms.Resize([length, width]),
+                transforms.ToTensor(),
+                transforms.Normalize(mean=mean, std=std)
+              ])
+  with torch.no_grad():
+    for start in range(0, len(calibration_paths), 32):
+      batch = [transform(load_image(path, (length, width))) for path in calibration_paths[start:start + 32]]
+      backbone(torch.stack(batch))
+  torch.quantization.convert(backbone, inplace=True)
+
+  head = torch.quantization.quantize_dynamic(nn.Sequential(model.classifer), {nn.Linear}, dtype=torch.qint8)
+  wrapper = ExportedClassifier(backbone, head, mean, std).eval()
+  example = torch.zeros(1, 3, length, width, dtype=torch.uint8)
+  with torch.no_grad():
+    scripted = torch.jit.trace(wrapper, example)
+
+  metadata = {"class_mapping": class_mapping, "length": length, "width": width,
+              "mean": list(mean), "std": list(std), "precision": "int8"}
+  artifact_path = Path(output_dirpath) / INT8_TORCHSCRIPT_FILENAME
+  torch.jit.save(scripted, str(artifact_path), _extra_files={TORCHSCRIPT_METADATA: json.dumps(metadata)})
+  return artifact_path
+
+# train_index / valid_index are refreshed DatasetIndexes, so only the images training reads are used
+def sample_calibration_paths(train_index, num_images, seed=0):
+  image_paths = [path for path, _ in train_index.samples()]
+  random.Random(seed).shuffle(image_paths)
+  return image_paths[:num_images]
+
+def compare_precisions(fp32_artifact, int8_artifact, valid_index, batch_size=32, num_workers=0):
+  # Accuracy and end-to-end throughput of both artifacts on the validation folder
+  classes = valid_index.classes()
+  samples = [(path, classes[target]) for path, target in valid_index.samples()]
+  image_paths = [path for path, _ in samples]
+  report = {"num_images": len(samples)}
+  for precision, artifact_path in [("fp32", fp32_artifact), ("int8", int8_artifact)]:
+    predictor = ScriptedInference(artifact_path, batch_size=batch_size, num_workers=num_workers)
+    start = time.perf_counter()
+    predictions = predictor(str(valid_index.root), image_paths=image_paths)
+    elapsed = time.perf_counter() - start
+    correct = sum(label == name for label, (_, name) in zip(predictions['labels'], samples))
+    report[precision + "_accuracy"] = correct / max(len(samples), 1)
+    report[precision + "_images_per_sec"] = len(samples) / elapsed if elapsed > 0 else 0.0
+  report["accuracy_delta"] = report["int8_accuracy"] - report["fp32_accuracy"]
+  report["speedup"] = report["int8_images_per_sec"] / report["fp32_images_per_sec"] if report["fp32_images_per_sec"] else 0.0
+  return report
+
+def _select_engine():
+  # fbgemm for x86 inspection PCs, qnnpack on ARM
+  engines = torch.backends.quantized.supported_engines
+  torch.backends.quantized.engine = 'fbgemm' if 'fbgemm' in engines else 'qnnpack'
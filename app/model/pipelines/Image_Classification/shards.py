@@ -0,0 +1,117 @@
+# shards.py
+# Image Classification Sharded Dataset, encoded images packed into large tar files for sequential reads
+import io
+import os
+import json
+import random
+from functools import partial
+import tarfile
+from pathlib import Path
+import torch                                      # For epoch seeds
+from torchvision import datasets                  # For folder listing
+from torch.utils.data import IterableDataset, get_worker_info  # For streaming
+from app.model.runtime import load_image          # For reduced-resolution decoding
+from app.model.cachefiles import make_cache_name, make_signature, build_directory, open_build  # For cache building
+
+SHARD_INDEX = "index.json"
+SHARD_BYTES = 256 * 1024 * 1024  # 256 MiB per tar shard
+
+# Packs an ImageFolder split, still encoded, into tar shards of about shard_bytes each, plus an index of
+# (data offset, size, target) per image. The shards stay valid tar files, readable by other tools.
+# The shards are rebuilt when any image of the split is added, removed or modified.
+# folder is an already listed ImageFolder of root, ex. from a dataset index.
+def build_shards(root, cache_dirpath, shard_bytes=SHARD_BYTES, folder=None):
+  folder = folder if folder is not None else datasets.ImageFolder(root=root)
+  cache_path = Path(cache_dirpath) / make_cache_name(Path(root).resolve(), "shards")
+  signature = make_signature(folder.samples)
+  return build_directory(cache_path, signature, partial(_build, folder, signature, shard_bytes))
+
+def _build(folder, signature, shard_bytes, tmp_path):
+  shards, tar = [], None
+  for index, (path, target) in enumerate(folder.samples):
+    if tar is None or tar.offset >= shard_bytes:
+      if tar is not None:
+        tar.close()
+      shards.append({"filename": _shard_filename(len(shards)), "records": []})
+      tar = tarfile.open(tmp_path / shards[-1]["filename"], 'w', format=tarfile.USTAR_FORMAT)
+    info = tarfile.TarInfo(f"{index:08d}{Path(path).suffix.lower()}")
+    info.size = os.path.getsize(path)
+    offset = tar.offset + tarfile.BLOCKSIZE  # ustar member data follows its one block header
+    with open(path, 'rb') as file:
+      tar.addfile(info, file)
+    shards[-1]["records"].append([offset, info.size, target])
+  if tar is not None:
+    tar.close()
+  with open(tmp_path / SHARD_INDEX, 'w') as file:
+    json.dump({"signature": signature, "num_images": len(folder.samples), "shards": shards,
+               "classes": folder.classes, "class_to_idx": folder.class_to_idx}, file)
+
+# Streams the shards sequentially. With shuffle, every epoch reads the shards in a new order and
+# mixes images through a shuffle buffer of shuffle_buffer images, as raw bytes, decoded when yielded.
+# Each loader worker reads its own subset of the shards.
+class ShardDataset(IterableDataset):
+  def __init__(self, cache_path, transform=None, decode_size=None, shuffle=False, shuffle_buffer=1000):
+    self.cache_path = Path(cache_path)
+    with open(self.cache_path / SHARD_INDEX) as file:
+      index = json.load(file)
+    self.shards = index["shards"]
+    self.num_images = index["num_images"]
+    self.classes = index["classes"]
+    self.class_to_idx = index["class_to_idx"]
+    self.transform = transform
+    self.decode_size = decode_size
+    self.shuffle = shuffle
+    self.shuffle_buffer = shuffle_buffer
+    self.epoch = 0
+    self.in_use = open_build(self.cache_path)  # Kept from deletion by newer builds while loaded
+
+  def __getstate__(self):
+    # Loader workers are covered by the process that created the dataset
+    state = dict(self.__dict__)
+    state['in_use'] = None
+    return state
+
+  def __len__(self):
+    return self.num_images
+
+  def __iter__(self):
+    worker = get_worker_info()
+    worker_id, num_workers = (worker.id, worker.num_workers) if worker is not None else (0, 1)
+    # Same shard order in every worker of an epoch. Workers get a new base seed every epoch,
+    # persistent workers keep theirs, hence the epoch count.
+    base_seed = worker.seed - worker.id if worker is not None else int(torch.empty((), dtype=torch.int64).random_())
+    self.epoch += 1
+    rng = random.Random(base_seed + self.epoch)
+    shards = list(self.shards)
+    if self.shuffle:
+      rng.shuffle(shards)
+    samples = self._read(shards[worker_id::num_workers])
+    if self.shuffle:
+      samples = self._shuffle(samples, rng)
+    for data, target in samples:
+      image = load_image(io.BytesIO(data), self.decode_size)
+      if self.transform is not None:
+        image = self.transform(image)
+      yield image, target
+
+  def _read(self, shards):
+    for shard in shards:
+      with open(self.cache_path / shard["filename"], 'rb', buffering=1024 * 1024) as file:
+        for offset, size, target in shard["records"]:
+          file.seek(offset)  # Forward over the tar header, reads stay sequential
+          yield file.read(size), target
+
+  def _shuffle(self, samples, rng):
+    buffer = []
+    for sample in samples:
+      if len(buffer) < self.shuffle_buffer:
+        buffer.append(sample)
+        continue
+      index = rng.randrange(len(buffer))
+      buffer[index], sample = sample, buffer[index]
+      yield sample
+    rng.shuffle(buffer)
+    yield from buffer
+
+def _shard_filename(shard_index):
+  return f"shard_{shard_index:04d}.tar"
@@ -0,0 +1,79 @@
+# stats.py
+# Image Classification Dataset Statistics, per-channel mean / std for data-driven normalization
+from collections import Counter
+from pathlib import Path
+import torch                                      # For per-image moments
+from torchvision import transforms                # For resizing like the train transforms
+from torch.utils.data import Dataset, DataLoader  # For parallel decoding
+from app.model.runtime import load_image          # For reduced-resolution decoding
+from app.model.cachefiles import make_cache_name, read_json, write_json  # For the per-image moment cache
+
+# Normalization of runs trained before dataset statistics, or with --normalize fixed
+FIXED_MEAN = [0.5, 0.5, 0.5]
+FIXED_STD = [0.5, 0.5, 0.5]
+
+def get_normalization(hparams):
+  return hparams.get('norm_mean', FIXED_MEAN), hparams.get('norm_std', FIXED_STD)
+
+# Per-channel mean / std of a folder's images at the trained resolution, plus a histogram of the
+# original image sizes. Workers reduce each image to its pixel count, channel means and sums of
+# squared deviations, which merge exactly (Chan / Welford), so only 7 numbers per image leave a
+# worker. Per-image moments are cached by path, size and mtime: reruns only decode changed images.
+# index is a refreshed DatasetIndex of the folder.
+def compute_statistics(index, length, width, cache_dirpath, batch_size=64, num_workers=0, num_sizes=10):
+  entries = index.entries()
+  cache_path = Path(cache_dirpath) / (make_cache_name(Path(index.root).resolve(), f"{length}x{width}") + ".json")
+  cached = read_json(cache_path)
+  moments = {}
+  missing = []
+  for path, _, (size, mtime, _, _) in entries:
+    entry = cached.get(path)
+    if entry is not None and entry[:2] == [size, mtime]:
+      moments[path] = entry
+    else:
+      missing.append((path, size, mtime))
+
+  if missing:
+    dataset = ImageMoments([path for path, _, _ in missing], length, width)
+    loader = DataLoader(dataset=dataset, batch_size=batch_size, shuffle=False, num_workers=num_workers)
+    rows = torch.cat([batch for batch in loader]).tolist()
+    for (path, size, mtime), row in zip(missing, rows):
+      moments[path] = [size, mtime] + row
+  if missing or len(moments) != len(cached):
+    write_json(cache_path, moments)
+
+  mean, std = _merge_moments([moments[path][2:] for path, _, _ in entries])
+  sizes = Counter(f"{record[2]}x{record[3]}" for _, _, record in entries if record[2] is not None)
+  return {"norm_mean": mean, "norm_std": std, "stats_images": len(entries),
+          "image_sizes": dict(sizes.most_common(num_sizes))}
+
+# Rows of [pixels, mean R, G, B, squared deviation sum R, G, B], in float64
+class ImageMoments(Dataset):
+  def __init__(self, image_paths, length, width):
+    self.image_paths = image_paths
+    self.decode_size = (length, width)
+    self.resize = transforms.Resize([length, width])
+
+  def __len__(self):
+    return len(self.image_paths)
+
+  def __getitem__(self, index):
+    try:
+      image = self.resize(load_image(self.image_paths[index], self.decode_size))
+    except Exception:  # PIL raises OSError, SyntaxError, ValueError, DecompressionBombError...
+      return torch.zeros(7, dtype=torch.float64)  # Unreadable images weigh nothing
+    pixels = transforms.functional.pil_to_tensor(image).flatten(1).double().div_(255.0)
+    mean = pixels.mean(dim=1)
+    squared_deviations = (pixels - mean[:, None]).pow_(2).sum(dim=1)
+    return torch.cat([torch.tensor([float(pixels.shape[1])], dtype=torch.float64), mean, squared_deviations])
+
+def _merge_moments(rows):
+  # Pairwise merge of (n, mean, M2) generalized to k parts: M2 = sum M2_i + sum n_i (mean_i - mean)^2
+  rows = torch.tensor(rows, dtype=torch.float64).view(-1, 7)
+  counts, means, squared_deviations = rows[:, :1], rows[:, 1:4], rows[:, 4:]
+  total = counts.sum()
+  if total == 0:
+    return list(FIXED_MEAN), list(FIXED_STD)
+  mean = (counts * means).sum(dim=0) / total
+  variance = (squared_deviations.sum(dim=0) + (counts * (means - mean) ** 2).sum(dim=0)) / total
+  return mean.tolist(), variance.sqrt().clamp(min=1e-6).tolist()
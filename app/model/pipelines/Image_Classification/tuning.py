@@ -0,0 +1,90 @@
+# tuning.py
+# Image Classification CPU Thread / DataLoader Worker Auto-Tuning
+import os
+import time
+import torch                                      # For thread settings, timing batches
+from torch import nn                              # For calibration head
+import torchvision.models as models               # For calibration backbone
+from torch.utils.data import DataLoader, IterableDataset  # For loader calibration
+
+# Measures loader throughput per worker count on the actual train set and training step throughput
+# per intra-op thread count on this machine, then splits the core budget between the two so
+# neither side starves the other. Returns the DataModule / Model settings to store in hparams, the
+# caller applies num_threads. Torch's thread count is process-wide, so with own_process=False (training
+# shares the GUI process) it is never changed, only the current count is measured.
+def auto_tune(hparams, train_data, cpu_budget=None, loader_batches=8, compute_batches=2, own_process=True):
+  cores = max(1, cpu_budget or os.cpu_count() or 1)
+  batch_size = hparams['batch_size']
+
+  thread_counts = _candidates(cores) if own_process else [min(torch.get_num_threads(), cores)]
+  compute = {threads: _measure_compute(hparams, threads, compute_batches, own_process) for threads in thread_counts}
+  worker_counts = [0] + [workers for workers in _candidates(cores) if workers < cores]
+  loading = {workers: _measure_loader(train_data, batch_size, workers, loader_batches) for workers in worker_counts}
+
+  # Maximize the slower of the two pipelines, fewer cores in total on ties
+  best = None
+  for threads in thread_counts:
+    for workers in worker_counts:
+      if threads + workers > cores:
+        continue
+      throughput = _combined_throughput(compute[threads], loading[workers], workers)
+      key = (throughput, -(threads + workers))
+      if best is None or key > best[0]:
+        best = (key, threads, workers)
+  _, threads, workers = best
+
+  # Deeper prefetch when loading only barely keeps up with the model
+  prefetch_factor = 4 if loading[workers] < 1.5 * compute[threads] else 2
+  return {"num_threads": threads, "num_workers": workers, "val_num_workers": workers,
+          "prefetch_factor": prefetch_factor, "persistent_workers": workers > 0,
+          "tuned_images_per_sec": round(best[0][0], 1)}
+
+def _combined_throughput(compute, loading, workers):
+  # Worker processes overlap with the model, without workers loading and compute alternate
+  if workers > 0:
+    return min(compute, loading)
+  return 1.0 / (1.0 / compute + 1.0 / loading)
+
+def _candidates(cores):
+  counts, count = [], 1
+  while count < cores:
+    counts.append(count)
+    count *= 2
+  return counts + [cores]
+
+def _measure_compute(hparams, threads, num_batches, set_threads=True):
+  # Same work as a training step: frozen backbone forward, head forward and backward
+  previous_threads = torch.get_num_threads()
+  if set_threads:
+    torch.set_num_threads(threads)
+  backbone = nn.Sequential(*list(models.resnet50().children())[:-1]).eval()
+  head = nn.Linear(2048, hparams.get('num_classes', 2))
+  x = torch.randn(hparams['batch_size'], 3, hparams['length'], hparams['width'])
+  try:
+    elapsed = 0.0
+    for index in range(num_batches + 1):
+      start = time.perf_counter()
+      with torch.no_grad():
+        features = backbone(x).flatten(1)
+      head(features).sum().backward()
+      if index > 0:  # First batch pays for allocations
+        elapsed += time.perf_counter() - start
+  finally:
+    if set_threads:
+      torch.set_num_threads(previous_threads)
+  return num_batches * hparams['batch_size'] / elapsed
+
+def _measure_loader(dataset, batch_size, workers, num_batches):
+  loader = DataLoader(dataset=dataset, batch_size=batch_size, shuffle=not isinstance(dataset, IterableDataset), 
+                      num_workers=workers)
+  iterator = iter(loader)
+  next(iterator, None)  # Worker startup is paid once per run with persistent workers
+  start, images = time.perf_counter(), 0
+  for _ in range(num_batches):
+    batch = next(iterator, None)
+    if batch is None:
+      break
+    images += len(batch[0])
+  elapsed = time.perf_counter() - start
+  del iterator
+  return images / elapsed if elapsed > 0 else float('inf')
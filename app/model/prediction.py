@@ -0,0 +1,124 @@
+# ---- Standard Lib Imports ----
+import glob
+from pathlib import Path
+from functools import partial
+import yaml
+
+# ---- Local Lib Imports ----
+import app.utils as utils
+from .. import config
+from .cache import ModelCache, PredictionCache
+from .runtime import ScriptedInference, find_torchscript_artifact
+from .dataset_index import DatasetIndex
+
+""" ---- Prediction Core ---- """
+# Shared by the Qt inference job and the headless command line, so it imports no Qt.
+model_cache = ModelCache(config.MODEL_CACHE_MAX_ENTRIES, config.MODEL_CACHE_MAX_BYTES)
+
+# on_progress(completed, total, batch_predictions) is called with the cached predictions first,
+# then as batches finish. is_cancelled() is polled between batches. Returns None when cancelled.
+def predict(pipeline, data_dir, ckpt_dir, batch_size=None, num_workers=None, on_progress=None, is_cancelled=None,
+            device="cpu", precision=None, use_cache=True):
+  # Type Safety
+  data_dir = str(data_dir)
+  ckpt_dir = str(ckpt_dir)
+  precision = precision if precision is not None else config.INFERENCE_PRECISION
+
+  # Get Checkpoint File in Checkpoint Path
+  [ckpt_file] = glob.glob(ckpt_dir + '/' + '*.ckpt')
+
+  if pipeline == "Image_Classification":
+    # Reuse the loaded model of a previously run checkpoint
+    classifier = model_cache.get(ckpt_file, partial(_load_classifier, ckpt_dir, ckpt_file, device, precision),
+                                 sizeof=lambda classifier: classifier.model_bytes(), variant=(device, precision))
+
+    # Only infer images that are new or modified since the last run with this checkpoint
+    image_paths = listImages(data_dir)
+    prediction_cache = PredictionCache(config.PREDICTION_CACHE_DIRPATH, pipeline, ckpt_file, data_dir, 
+                                       precision=precision, artifact_path=classifier.artifact_path,
+                                       max_bytes=config.PREDICTION_CACHE_MAX_BYTES)
+    cached, missing = prediction_cache.lookup(image_paths) if use_cache else ({}, image_paths)
+    completed = len(cached)
+    if on_progress is not None:
+      cached_paths = [image_path for image_path in image_paths if image_path in cached]
+      on_progress(completed, len(image_paths),
+                  classifier.from_records(cached_paths, [cached[image_path] for image_path in cached_paths]))
+
+    # Run Inference, cache is saved even when cancelled so finished batches are kept
+    try:
+      for batch in classifier.stream(data_dir, batch_size=batch_size, num_workers=num_workers, image_paths=missing):
+        records = classifier.to_records(batch)
+        prediction_cache.update(batch['image_paths'], records)
+        cached.update(zip(batch['image_paths'], records))
+        completed += len(records)
+        if on_progress is not None:
+          on_progress(completed, len(image_paths), batch)
+        if is_cancelled is not None and is_cancelled():
+          return None
+    finally:
+      prediction_cache.save()
+
+    # Merge cached and new predictions in directory order
+    return classifier.from_records(image_paths, [cached[image_path] for image_path in image_paths])
+
+# Images of an inference directory, from its persistent index
+def listImages(data_dir):
+  return DatasetIndex(config.DATASET_INDEX_DIRPATH, data_dir, labeled=False).refresh().paths()
+
+def _load_classifier(ckpt_dir, ckpt_file, device, precision):
+  # Prepare Inference Inputs
+  with open(Path(ckpt_dir) / 'hparams.yaml') as file:
+    params = yaml.load(file, Loader=yaml.FullLoader)
+
+  # Prefer the exported TorchScript runtime, unless stored embeddings can skip the backbone
+  artifact_path = find_torchscript_artifact(ckpt_dir, ckpt_file, precision=precision)
+  if artifact_path is None and precision != "fp32":
+    artifact_path = find_torchscript_artifact(ckpt_dir, ckpt_file)
+  if artifact_path is not None and not params.get('feature_store'):
+    return ScriptedInference(artifact_path, batch_size=params.get('batch_size', 32),
+                             num_workers=config.INFERENCE_NUM_WORKERS, device=device)
+
+  # Lightning is only needed for checkpoints without a TorchScript export
+  import app.model.pipelines.Image_Classification as ImageClassification
+  class_mapping = utils.getClassMappingFromDirectory(ckpt_dir)
+  classifier = ImageClassification.inference.Inference(class_mapping, params,
+                                                       num_workers=config.INFERENCE_NUM_WORKERS, device=device)
+  classifier.load(ckpt_file)
+  if params.get('feature_store'):
+    classifier.model.attach_feature_store(config.FEATURE_STORE_FILEPATH, config.FEATURE_STORE_MAX_BYTES)
+  return classifier
+
+# Writes an INT8 artifact next to the checkpoint and a report comparing it against FP32
+def quantizeModel(pipeline, ckpt_dir):
+  ckpt_dir = str(ckpt_dir)
+  [ckpt_file] = glob.glob(ckpt_dir + '/' + '*.ckpt')
+  if pipeline == "Image_Classification":
+    import app.model.pipelines.Image_Classification as ImageClassification
+    class_mapping = utils.getClassMappingFromDirectory(ckpt_dir)
+    with open(Path(ckpt_dir) / 'hparams.yaml') as file:
+      params = yaml.load(file, Loader=yaml.FullLoader)
+
+    # FP32 baseline is the regular TorchScript export
+    fp32_artifact = find_torchscript_artifact(ckpt_dir, ckpt_file)
+    if fp32_artifact is None:
+      fp32_artifact = ImageClassification.export.export_torchscript(ckpt_file, class_mapping, ckpt_dir)
+
+    # Calibrate on a sample of the training folder, evaluate on the validation folder
+    quantization = ImageClassification.quantization
+    train_index = DatasetIndex(config.DATASET_INDEX_DIRPATH, params['input_dirpath'] + '/train').refresh()
+    valid_index = DatasetIndex(config.DATASET_INDEX_DIRPATH, params['input_dirpath'] + '/valid').refresh()
+    calibration_paths = quantization.sample_calibration_paths(train_index, config.QUANTIZATION_CALIBRATION_IMAGES)
+    int8_artifact = quantization.quantize_torchscript(ckpt_file, class_mapping, ckpt_dir, calibration_paths)
+    report = quantization.compare_precisions(fp32_artifact, int8_artifact, valid_index,
+                                             batch_size=params.get('batch_size', 32), 
+                                             num_workers=config.INFERENCE_NUM_WORKERS)
+    report['calibration_images'] = len(calibration_paths)
+    with open(Path(ckpt_dir) / 'quantization_report.yaml', 'w') as file:
+      yaml.dump(report, file)
+
+    # An int8 model loaded before the artifact existed fell back to FP32
+    model_cache.clear()
+    return report
+
+def getModelCacheStats():
+  return model_cache.stats()
@@ -0,0 +1,206 @@
+# runtime.py
+# Lean Inference Runtime, shared batching/decoding for classifiers and the TorchScript runtime.
+# Only depends on torch/torchvision/PIL, so exported models run without PyTorch Lightning.
+import io
+import json
+import hashlib
+from abc import ABC, abstractmethod
+from pathlib import Path
+from PIL import Image
+import numpy as np                          # For vectorized label lookup
+import torch                                # For tensor manipulation
+from torchvision import transforms          # For pre-processing
+from torch.nn import functional as F        # For final softmax activation
+from torch.utils.data import Dataset, DataLoader  # For parallel image loading
+
+TORCHSCRIPT_FILENAME = "model.torchscript.pt"
+INT8_TORCHSCRIPT_FILENAME = "model.int8.torchscript.pt"
+TORCHSCRIPT_METADATA = "metadata.json"
+# A loader process re-imports the application under spawn (Windows), seconds before its first batch,
+# so one is only started for at least this many batches of its own
+MIN_BATCHES_PER_WORKER = 16
+
+def hash_bytes(data):
+  return hashlib.sha1(data).hexdigest()
+
+# Decodes an image as RGB. With size=(length, width), JPEGs are downscaled by the decoder itself
+# (DCT scaling, up to 8x, never below size), so the exact Resize after it works on a small image.
+# Other formats decode in full, the output of the following Resize has the same shape either way.
+def load_image(file, size=None):
+  image = Image.open(file)
+  if size is not None:
+    image.draft('RGB', (size[1], size[0]))
+  return image.convert('RGB')
+
+# Decodes and transforms images in DataLoader workers, returns the path alongside the tensor.
+# With keys, also returns the feature store key of the image (content hash, unflipped view).
+# decode_size=(length, width) enables reduced-resolution JPEG decoding, see load_image.
+class ImageFileDataset(Dataset):
+  def __init__(self, image_paths, transform, with_keys=False, decode_size=None):
+    self.image_paths = image_paths
+    self.transform = transform
+    self.with_keys = with_keys
+    self.decode_size = decode_size
+
+  def __len__(self):
+    return len(self.image_paths)
+
+  def __getitem__(self, index):
+    image_path = self.image_paths[index]
+    if not self.with_keys:
+      with open(image_path, 'rb') as file:
+        img = load_image(file, self.decode_size)
+      return self.transform(img), image_path
+    with open(image_path, 'rb') as file:
+      data = file.read()
+    img = load_image(io.BytesIO(data), self.decode_size)
+    return self.transform(img), image_path, hash_bytes(data) + "|h0v0"
+
+# Streams a directory through a loaded classifier. Subclasses set self.model and self.transform, and implement load.
+class Predictor(ABC):
+  def __init__(self, class_mapping, batch_size=32, num_workers=0, top_k=3, device="cpu"):
+    self.class_mapping = class_mapping
+    self.device = torch.device(device)
+    self.top_k = top_k
+    # Index -> class name lookup array, built once instead of per image
+    self.class_names = self._make_class_names(class_mapping)
+    # Images decoded at once, bounds peak memory independent of directory size
+    self.batch_size = batch_size
+    # Loader processes decoding upcoming batches while the model runs the current one
+    self.num_workers = num_workers
+    self.model = None
+    self.transform = None
+    self.decode_size = None  # (length, width) the transform resizes to
+    self.artifact_path = None  # exported file the model was loaded from, None for a checkpoint
+
+  def __call__(self, data_path, ckpt_path=None, batch_size=None, num_workers=None, image_paths=None):
+    if ckpt_path is not None:
+      self.load(ckpt_path)
+    batches = list(self.stream(data_path, batch_size=batch_size, num_workers=num_workers,
+                               image_paths=image_paths))
+    return self._merge_batches(batches)
+
+  # Streaming Inference, yields predictions one mini-batch at a time in directory order
+  # image_paths restricts inference to a subset of the directory, ex. uncached images
+  def stream(self, data_path, batch_size=None, num_workers=None, image_paths=None):
+    batch_size = batch_size if batch_size is not None else self.batch_size
+    num_workers = num_workers if num_workers is not None else self.num_workers
+    if image_paths is None:
+      image_paths = self.list_images(data_path)
+    loader = self._make_loader(image_paths, batch_size, num_workers)
+    for batch in loader:
+      tensors, batch_paths = batch[0], list(batch[1])
+      keys = list(batch[2]) if len(batch) == 3 else None
+      with torch.no_grad():
+        output = self._forward(tensors.to(self.device), keys)
+      predictions = self._translate_output(output)
+      predictions["image_paths"] = batch_paths
+      yield predictions
+
+  # Loaded model is kept on the instance, so a cached predictor skips the reload
+  @abstractmethod
+  def load(self, path):
+    pass
+
+  def model_bytes(self):
+    tensors = list(self.model.parameters()) + list(self.model.buffers())
+    return sum(tensor.numel() * tensor.element_size() for tensor in tensors)
+
+  def list_images(self, data_path):
+    return [str(path) for path in Path(data_path).iterdir()]
+
+  # Per-image prediction records, the unit stored by the prediction cache
+  def to_records(self, predictions):
+    return [{"label": label, "confidence": float(confidence),
+             "topk_labels": topk_labels.tolist(), "topk_probs": topk_probs.tolist()}
+            for label, confidence, topk_labels, topk_probs in zip(predictions["labels"], predictions["confidences"],
+                                                                  predictions["topk_labels"], predictions["topk_probs"])]
+
+  def from_records(self, image_paths, records):
+    if not records:
+      return self._merge_batches([])
+    return {"image_paths": list(image_paths),
+            "labels": [record["label"] for record in records],
+            "confidences": np.array([record["confidence"] for record in records]),
+            "topk_labels": np.array([record["topk_labels"] for record in records], dtype=object),
+            "topk_probs": np.array([record["topk_probs"] for record in records])}
+
+  # Utilities
+  def _forward(self, tensors, keys):
+    return self.model(tensors)
+
+  def _with_keys(self):
+    return False
+
+  def _make_loader(self, image_paths, batch_size, num_workers):
+    # Worker startup is not worth it for small directories, they are decoded in this process
+    num_batches = -(-len(image_paths) // batch_size)
+    num_workers = min(num_workers, num_batches // MIN_BATCHES_PER_WORKER)
+    dataset = ImageFileDataset(image_paths, self.transform, with_keys=self._with_keys(), decode_size=self.decode_size)
+    return DataLoader(dataset=dataset, batch_size=batch_size, shuffle=False, num_workers=num_workers,
+                      pin_memory=self.device.type == 'cuda')
+
+  def _make_class_names(self, class_mapping):
+    class_names = np.empty(max(class_mapping.values(), default=-1) + 1, dtype=object)
+    for name, index in class_mapping.items():
+      class_names[index] = name
+    return class_names
+
+  def _translate_output(self, one_hot_output):
+    # One batched softmax / top-k over the whole logit matrix
+    probabilities = F.softmax(one_hot_output, dim=1)  # Map logits onto [0, 1] range
+    top_k = min(self.top_k, probabilities.shape[1])
+    topk_probs, topk_ids = probabilities.topk(top_k, dim=1)
+    topk_probs = topk_probs.cpu().numpy()
+    topk_labels = self.class_names[topk_ids.cpu().numpy()]
+    return {"labels": topk_labels[:, 0].tolist(), "confidences": topk_probs[:, 0],
+            "topk_labels": topk_labels, "topk_probs": topk_probs}
+
+  def _merge_batches(self, batches):
+    if not batches:
+      return {"image_paths": [], "labels": [], "confidences": np.empty(0),
+              "topk_labels": np.empty((0, self.top_k), dtype=object), "topk_probs": np.empty((0, self.top_k))}
+    merged = {"image_paths": [], "labels": []}
+    for batch in batches:
+      merged["image_paths"].extend(batch["image_paths"])
+      merged["labels"].extend(batch["labels"])
+    for key in ("confidences", "topk_labels", "topk_probs"):
+      merged[key] = np.concatenate([batch[key] for batch in batches])
+    return merged
+
+""" ---- TorchScript Runtime ---- """
+# Runs a frozen TorchScript export of a trained run. Normalization is embedded in the module,
+# the loader only resizes to the exported resolution and hands over uint8 tensors.
+class ScriptedInference(Predictor):
+  def __init__(self, artifact_path, batch_size=32, num_workers=0, top_k=3, device="cpu"):
+    extra_files = {TORCHSCRIPT_METADATA: ""}
+    model = torch.jit.load(str(artifact_path), map_location=device, _extra_files=extra_files)
+    # Conv/batchnorm folding and CPU kernel selection, not serializable so done per load
+    if torch.device(device).type == 'cpu' and hasattr(torch.jit, 'optimize_for_inference'):  # torch >= 1.9
+      model = torch.jit.optimize_for_inference(model)
+    self.metadata = json.loads(extra_files[TORCHSCRIPT_METADATA])
+    super().__init__(self.metadata['class_mapping'], batch_size=batch_size, num_workers=num_workers, top_k=top_k,
+                     device=device)
+    self.model = model
+    self.artifact_path = Path(artifact_path)
+    self.artifact_bytes = self.artifact_path.stat().st_size
+    self.decode_size = (self.metadata['length'], self.metadata['width'])
+    self.transform = transforms.Compose([
+                      transforms.Resize([self.metadata['length'], self.metadata['width']]),
+                      transforms.PILToTensor()
+                    ])
+
+  def load(self, path):
+    return self
+
+  def model_bytes(self):
+    # Frozen weights are graph constants, not parameters, so use the artifact size
+    return self.artifact_bytes
+
+def find_torchscript_artifact(ckpt_dir, ckpt_file, precision="fp32"):
+  # Only use an export that is at least as new as the checkpoint it was made from
+  filename = INT8_TORCHSCRIPT_FILENAME if precision == "int8" else TORCHSCRIPT_FILENAME
+  artifact_path = Path(ckpt_dir) / filename
+  if artifact_path.is_file() and artifact_path.stat().st_mtime >= Path(ckpt_file).stat().st_mtime:
+    return artifact_path
+  return None
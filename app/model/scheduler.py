@@ -0,0 +1,100 @@
+# ---- Standard Lib Imports ----
+import os
+import heapq
+import itertools
+import threading
+
+# ---- External Lib Imports ----
+from PyQt5.QtCore import QObject, pyqtSignal, QThreadPool
+
+""" ---- Training Job Scheduler ---- """
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+
+class Job(object):
+  def __init__(self, job_id, name, worker, priority, threads):
+    self.id = job_id
+    self.name = name
+    self.worker = worker
+    self.priority = priority
+    self.threads = threads
+    self.state = QUEUED
+
+  def summary(self):
+    return {"id": self.id, "name": self.name, "state": self.state, 
+            "priority": self.priority, "threads": self.threads}
+
+class SchedulerSignals(QObject):
+  changed = pyqtSignal(list)  # job summaries in submission order
+
+# Runs training workers from a priority queue, higher priority first and FIFO among equals.
+# At most max_concurrent jobs run at once, each given a CPU thread budget so concurrent
+# jobs share the cores instead of oversubscribing them. Workers report back through their
+# finished / error signals.
+class JobScheduler(object):
+  def __init__(self, max_concurrent=1, threads_per_job=None):
+    self.signals = SchedulerSignals()
+    self.max_concurrent = max(1, max_concurrent)
+    self.threads_per_job = threads_per_job or max(1, (os.cpu_count() or 1) // self.max_concurrent)
+    self.threadpool = QThreadPool()
+    self.threadpool.setMaxThreadCount(self.max_concurrent)
+    self.jobs = []   # every submitted job, submission order
+    self.queue = []  # heap of (-priority, job id, job), cancelled jobs are skipped lazily
+    self.counter = itertools.count()
+    self.running = 0
+    self.lock = threading.RLock()
+
+  def submit(self, name, worker, priority=0):
+    with self.lock:
+      job = Job(next(self.counter), name, worker, priority, self.threads_per_job)
+      worker.num_threads = job.threads
+      worker.signals.finished.connect(lambda: self._finish(job, DONE))
+      worker.signals.error.connect(lambda _: self._finish(job, FAILED))
+      self.jobs.append(job)
+      heapq.heappush(self.queue, (-priority, job.id, job))
+      self._dispatch()
+    self._notify()
+    return job
+
+  # Only queued jobs can be cancelled, returns the cancelled job or None
+  def cancel(self, job_id):
+    with self.lock:
+      job = self.get(job_id)
+      if job is None or job.state != QUEUED:
+        return None
+      job.state = CANCELLED
+    self._notify()
+    return job
+
+  def get(self, job_id):
+    with self.lock:
+      return next((job for job in self.jobs if job.id == job_id), None)
+
+  # Queued and running jobs
+  def active(self):
+    with self.lock:
+      return [job for job in self.jobs if job.state in (QUEUED, RUNNING)]
+
+  def summaries(self):
+    with self.lock:
+      return [job.summary() for job in self.jobs]
+
+  def _dispatch(self):
+    while self.running < self.max_concurrent and self.queue:
+      _, _, job = heapq.heappop(self.queue)
+      if job.state != QUEUED:
+        continue
+      job.state = RUNNING
+      self.running += 1
+      self.threadpool.start(job.worker)
+
+  def _finish(self, job, state):
+    with self.lock:
+      if job.state != RUNNING:
+        return
+      job.state = state
+      self.running -= 1
+      self._dispatch()
+    self._notify()
+
+  def _notify(self):
+    self.signals.changed.emit(self.summaries())
@@ -0,0 +1,213 @@
+# ---- Standard Lib Imports ----
+import csv
+import math
+import time
+import random
+import itertools
+import multiprocessing
+from pathlib import Path
+import yaml
+
+# ---- External Lib Imports ----
+from pytorch_lightning.callbacks import Callback
+
+# ---- Local Lib Imports ----
+from .. import config
+from . import training
+
+""" ---- Search Spaces ---- """
+# Sweep spec, a YAML file:
+#   method: grid               # grid, random or halving (random trials, bad ones stopped early)
+#   num_trials: 16             # random / halving only
+#   max_parallel: 2            # trials trained at once, one process each
+#   seed: 0
+#   params:                    # any Model, DataModule or Trainer argument
+#     lr: {min: 1.0e-5, max: 1.0e-2, log: true}
+#     batch_size: [32, 64]
+#     max_epochs: 9            # single values are fixed
+#   halving: {min_epochs: 1, reduction_factor: 3}
+def load_spec(spec_path):
+  with open(spec_path) as file:
+    return yaml.load(file, Loader=yaml.FullLoader)
+
+def make_trials(spec):
+  params = spec.get('params', {})
+  if spec.get('method', 'grid') == 'grid':
+    names = list(params)
+    choices = [_grid_values(name, params[name]) for name in names]
+    return [dict(zip(names, values)) for values in itertools.product(*choices)]
+  rng = random.Random(spec.get('seed', 0))
+  return [{name: _sample(space, rng) for name, space in params.items()} for _ in range(spec.get('num_trials', 8))]
+
+def _grid_values(name, space):
+  if isinstance(space, dict):
+    raise ValueError(f"Grid sweeps need a list of values for {name}, ranges are for random / halving sweeps.")
+  return space if isinstance(space, list) else [space]
+
+def _sample(space, rng):
+  if isinstance(space, list):
+    return rng.choice(space)
+  if not isinstance(space, dict):
+    return space
+  low, high = space['min'], space['max']
+  if space.get('log'):
+    return math.exp(rng.uniform(math.log(low), math.log(high)))
+  if isinstance(low, int) and isinstance(high, int):
+    return rng.randint(low, high)
+  return rng.uniform(low, high)
+
+# Command line arguments with the option set to value, later occurrences win in argparse.
+# Flags without a value are switched on or off instead.
+def _override(arguments, action, value):
+  option = action.option_strings[-1]
+  if action.nargs == 0:
+    arguments = [argument for argument in arguments if argument not in action.option_strings]
+    return arguments + [option] if value else arguments
+  values = value if isinstance(value, list) else [value]
+  return arguments + [option] + [str(item) for item in values]
+
+""" ---- Early Termination ---- """
+# Asynchronous successive halving. At rung epochs min_epochs * reduction_factor^k, a trial only
+# continues while its val_acc is in the top 1 / reduction_factor of the trials that reached
+# that rung so far. Rung scores are shared by all trial processes through a manager dict.
+class HalvingPruner(Callback):
+  def __init__(self, rungs, lock, min_epochs=1, reduction_factor=3, monitor='val_acc'):
+    self.rungs = rungs
+    self.lock = lock
+    self.min_epochs = min_epochs
+    self.reduction_factor = reduction_factor
+    self.monitor = monitor
+
+  def on_validation_end(self, trainer, pl_module):
+    if trainer.running_sanity_check or self.monitor not in trainer.callback_metrics:
+      return
+    epoch = trainer.current_epoch + 1
+    if not self._is_rung(epoch):
+      return
+    score = float(trainer.callback_metrics[self.monitor])
+    with self.lock:
+      scores = self.rungs.get(epoch, []) + [score]
+      self.rungs[epoch] = scores
+    keep = max(1, len(scores) // self.reduction_factor)
+    if score < sorted(scores, reverse=True)[keep - 1]:
+      trainer.should_stop = True
+
+  def _is_rung(self, epoch):
+    rung = self.min_epochs
+    while rung < epoch:
+      rung *= self.reduction_factor
+    return rung == epoch
+
+""" ---- Sweep Runner ---- """
+# Trains every trial as its own run in database/<pipeline>/, max_parallel child processes at once,
+# and keeps a summary table of best val_acc per run next to the runs.
+class Sweep(object):
+  def __init__(self, pipeline, sweep_name, spec, model_input, trainer_input, num_threads=None):
+    self.pipeline = pipeline
+    self.sweep_name = sweep_name
+    self.spec = spec
+    self.method = spec.get('method', 'grid')
+    self.max_parallel = max(1, spec.get('max_parallel', config.SWEEP_MAX_PARALLEL))
+    self.num_threads = num_threads  # CPU thread budget of the whole sweep
+    self.summary_path = Path("database") / pipeline / f"{sweep_name} - Sweep Summary.csv"
+
+    # Verify every trial up front with the training parsers, so a bad value fails before anything is queued
+    training.parse_training_args(pipeline, model_input, trainer_input)
+    model_parser, trainer_parser = training.make_parsers(pipeline)
+    self.trials = []
+    for index, params in enumerate(make_trials(spec)):
+      trial_model_input, trial_trainer_input = list(model_input), list(trainer_input)
+      for name, value in params.items():
+        if '--' + name in model_parser._option_string_actions:
+          trial_model_input = _override(trial_model_input, model_parser._option_string_actions['--' + name], value)
+        elif '--' + name in trainer_parser._option_string_actions:
+          trial_trainer_input = _override(trial_trainer_input, trainer_parser._option_string_actions['--' + name], value)
+        else:
+          raise ValueError(f"Unknown hyperparameter in sweep: {name}")
+      try:
+        model_dict, trainer_dict = training.parse_training_args(pipeline, trial_model_input, trial_trainer_input)
+      except SystemExit:  # argparse has printed the reason
+        raise ValueError(f"Invalid hyperparameters in sweep trial {index + 1}: {params}")
+      self.trials.append({"run_name": f"{sweep_name} - Trial {index + 1:02d}", "params": params,
+                          "model_dict": model_dict, "trainer_dict": trainer_dict,
+                          "status": "queued", "best_val_acc": None, "epochs": None, "error": None})
+
+  def run_names(self):
+    return [trial["run_name"] for trial in self.trials]
+
+  # on_update(summaries) is called whenever a trial starts or ends
+  def run(self, on_update=None):
+    context = multiprocessing.get_context('spawn')
+    manager = context.Manager()
+    rungs, lock = manager.dict(), manager.Lock()
+    threads = max(1, self.num_threads // self.max_parallel) if self.num_threads else None
+    pending, running = list(self.trials), []
+    try:
+      while pending or running:
+        while pending and len(running) < self.max_parallel:
+          trial = pending.pop(0)
+          callbacks = [HalvingPruner(rungs, lock, **self.spec.get('halving', {}))] if self.method == 'halving' else []
+          training.prepare_run(self.pipeline, trial["run_name"], trial["model_dict"], trial["trainer_dict"])
+          events = context.Queue()
+          process = context.Process(target=training.run_training_process,
+                                    args=(self.pipeline, trial["run_name"], trial["model_dict"],
+                                          trial["trainer_dict"], threads, events, callbacks))
+          process.start()
+          trial["status"] = "running"
+          running.append((trial, process, events))
+          self._notify(on_update)
+
+        for entry in list(running):
+          trial, process, events = entry
+          if self._poll(trial, process, events):
+            process.join()
+            running.remove(entry)
+            self.write_summary()
+            self._notify(on_update)
+        time.sleep(0.2)
+    finally:
+      # Stop trials left running by an error, so none keeps writing into database/
+      for trial, process, _ in running:
+        process.terminate()
+        process.join()
+        trial["status"] = "stopped"
+      manager.shutdown()
+    self.write_summary()
+    return self.summaries()
+
+  def summaries(self):
+    return [{key: trial[key] for key in ("run_name", "status", "best_val_acc", "epochs", "params", "error")}
+            for trial in self.trials]
+
+  # Best val_acc first, trials without a score last
+  def write_summary(self):
+    param_names = sorted({name for trial in self.trials for name in trial["params"]})
+    rows = sorted(self.trials, key=lambda trial: -trial["best_val_acc"] if trial["best_val_acc"] is not None else math.inf)
+    with open(self.summary_path, 'w', newline='') as file:
+      writer = csv.writer(file)
+      writer.writerow(["run_name", "status", "best_val_acc", "epochs"] + param_names)
+      for trial in rows:
+        writer.writerow([trial["run_name"], trial["status"], trial["best_val_acc"], trial["epochs"]] +
+                        [trial["params"].get(name) for name in param_names])
+
+  # Consumes the trial's pending events, returns True once the trial has ended
+  def _poll(self, trial, process, events):
+    while True:
+      event = training.get_process_event(process, events)
+      if event is None:
+        return False
+      kind, payload = event
+      if kind == "result":
+        trial["best_val_acc"] = payload["best_val_acc"]
+        trial["epochs"] = payload["epochs"]
+        trial["status"] = "pruned" if self.method == 'halving' and payload["stopped_early"] else "finished"
+      elif kind == "error":
+        trial["status"] = "failed"
+        trial["error"] = payload  # Traceback, reported through on_update
+        return True
+      elif kind == "finished":
+        return True
+
+  def _notify(self, on_update):
+    if on_update is not None:
+      on_update(self.summaries())
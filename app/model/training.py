@@ -0,0 +1,245 @@
+# ---- Standard Lib Imports ----
+import os
+import glob
+import shutil
+import time
+import queue
+import traceback
+import yaml
+
+# ---- External Lib Imports ----
+from argparse import ArgumentParser
+import torch
+from pytorch_lightning import Trainer
+from pytorch_lightning.callbacks import Callback, EarlyStopping
+from pytorch_lightning.callbacks.model_checkpoint import ModelCheckpoint
+from pytorch_lightning.loggers import TensorBoardLogger
+
+# ---- Local Lib Imports ----
+import app.model.pipelines.Image_Classification as ImageClassification
+import app.utils as utils
+from .. import config
+from .checkpointing import StateCheckpoint, get_state_path, save_job, update_job
+from .dataset_index import DatasetIndex
+
+""" ---- Training Core ---- """
+# Qt-free, so training runs the same in a GUI worker thread or in a child process.
+
+def _set_ckpt_callback(pipeline, run_name):
+  output_directory = "database" + '/' + pipeline + '/' + run_name
+  checkpoint_callback = ModelCheckpoint(
+    dirpath = output_directory,
+    save_weights_only = True,
+    monitor = 'val_acc',
+    mode = 'max',
+    save_top_k = 1
+  )
+  return checkpoint_callback
+
+def _set_logger(pipeline, run_name):
+  logger = TensorBoardLogger(save_dir='database', name = pipeline, version = run_name) # Creates a logging directory w/ experiment name
+  return logger
+
+def make_parsers(pipeline):
+  # Init argparsers for input verification
+  model_parser = ArgumentParser("Model Parser")
+  model_parser.add_argument('input_dirpath')
+  trainer_parser = ArgumentParser("Trainer Parser")
+  trainer_parser = Trainer.add_argparse_args(trainer_parser)
+  if pipeline == "Image_Classification":
+    model_parser = ImageClassification.datamodule.DataModule.add_model_specific_args(model_parser)
+    model_parser = ImageClassification.model.Model.add_model_specific_args(model_parser)
+  return model_parser, trainer_parser
+
+# Verifies command line style hyperparameters, returns (model_dict, trainer_dict)
+def parse_training_args(pipeline, model_input, trainer_input):
+  model_parser, trainer_parser = make_parsers(pipeline)
+  trainer_dict = vars(trainer_parser.parse_args(trainer_input))
+  model_dict = vars(model_parser.parse_args(model_input))
+
+  # Set Model-Specific Trainer Defaults:
+  if pipeline == "Image_Classification":
+    if trainer_dict["max_epochs"] == None:
+      trainer_dict["max_epochs"] = 10
+  return model_dict, trainer_dict
+
+# Reserves the run's output directory, so queued runs keep their names, and saves the job to resume it
+def prepare_run(pipeline, run_name, model_dict, trainer_dict):
+  output_directory = "database" + '/' + pipeline + '/' + run_name
+  os.mkdir(output_directory)
+
+  # Perform Pipeline-Specific Actions:
+  if pipeline == "Image_Classification":  # Comes with Class Map 
+    # TODO: Derive Class Map as opposed to expecting user to provide.
+
+    # Specify number of classes in model and copy the class map to the output directory
+    class_map_path = model_dict['input_dirpath'] + '/' + config.IMAGE_CLASSIFICATION_CLASSMAP_FILENAME + ".txt"
+    model_dict['num_classes'] = utils.getNumberOfClasses(class_map_path)
+    shutil.copy2(class_map_path, output_directory)
+  save_job(output_directory, pipeline, run_name, model_dict, trainer_dict)
+  return output_directory
+
+# Builds the trainer, model and datamodule from verified hyperparameter dicts.
+# resume continues from the run's last full-state checkpoint.
+# cpu_budget caps the cores auto-tuning may split between threads and loader workers.
+# Thread counts are left to the caller, own_process=True lets auto-tuning time other counts.
+def build_training(pipeline, run_name, model_dict, trainer_dict, callbacks=(), resume=False, cpu_budget=None,
+                   own_process=False):
+  output_directory = "database" + '/' + pipeline + '/' + run_name
+  trainer_dict = dict(trainer_dict)
+  trainer_dict['logger'] = _set_logger(pipeline, run_name)
+  trainer_dict['callbacks'] = [_set_ckpt_callback(pipeline, run_name), RunSummaryCallback(output_directory),
+                               StateCheckpoint(output_directory, config.STATE_CHECKPOINT_EVERY_N_BATCHES)] + list(callbacks)
+  if resume:
+    trainer_dict['resume_from_checkpoint'] = str(get_state_path(output_directory))
+  if model_dict.get('early_stop_patience'):
+    trainer_dict['callbacks'].append(EarlyStopping(monitor='val_acc', mode='max', patience=model_dict['early_stop_patience'],
+                                                   min_delta=model_dict.get('early_stop_min_delta', 0.0)))
+  trainer = Trainer(**trainer_dict)
+
+  if pipeline == "Image_Classification":
+    # Measured before the DataModule and Model are built, so both normalize alike and hparams.yaml keeps it.
+    # Saved to the job too, a resumed run keeps the statistics its weights were trained with.
+    if model_dict.get('normalize') == 'dataset' and not (resume and 'norm_mean' in model_dict):
+      train_index = DatasetIndex(config.DATASET_INDEX_DIRPATH, model_dict['input_dirpath'] + '/train').refresh()
+      statistics = ImageClassification.stats.compute_statistics(train_index, model_dict['length'], model_dict['width'], 
+                                                                config.DATASET_STATS_DIRPATH, 
+                                                                num_workers=model_dict['num_workers'])
+      model_dict.update(statistics)
+      update_job(output_directory, statistics)
+    datamodule = ImageClassification.datamodule.DataModule(model_dict, cache_dirpath=config.DATASET_CACHE_DIRPATH,
+                                                           index_dirpath=config.DATASET_INDEX_DIRPATH)
+    # Tuned before the Model is built, so the chosen settings are saved in hparams.yaml
+    if model_dict.get('auto_tune'):
+      datamodule.setup('fit')
+      model_dict.update(ImageClassification.tuning.auto_tune(model_dict, datamodule.train_data, cpu_budget, 
+                                                             own_process=own_process))
+    model = ImageClassification.model.Model(model_dict)
+    if model_dict.get('feature_store'):
+      model.attach_feature_store(config.FEATURE_STORE_FILEPATH, config.FEATURE_STORE_MAX_BYTES)
+  return trainer, model, datamodule
+
+# Writes a frozen TorchScript artifact with embedded preprocessing next to the checkpoint
+def exportTorchScript(pipeline, ckpt_dir):
+  ckpt_dir = str(ckpt_dir)
+  [ckpt_file] = glob.glob(ckpt_dir + '/' + '*.ckpt')
+  if pipeline == "Image_Classification":
+    class_mapping = utils.getClassMappingFromDirectory(ckpt_dir)
+    return ImageClassification.export.export_torchscript(ckpt_file, class_mapping, ckpt_dir)
+
+# Fits, then exports the run. Export failures are logged, the checkpoint is still usable.
+def fit_and_export(pipeline, run_name, trainer, model, datamodule):
+  trainer.fit(model, datamodule)
+  result = summarize_run(trainer)
+  # Frozen TorchScript artifact for the lean inference runtime
+  try:
+    exportTorchScript(pipeline, "database" + '/' + pipeline + '/' + run_name)
+  except Exception:
+    print(traceback.format_exc())
+  return result
+
+def summarize_run(trainer):
+  best_score = trainer.checkpoint_callback.best_model_score if trainer.checkpoint_callback else None
+  return {"best_val_acc": float(best_score) if best_score is not None else None,
+          "epochs": trainer.current_epoch + 1, "stopped_early": bool(trainer.should_stop)}
+
+# Reports epoch / batch position and the latest logged metrics to emit(dict).
+# Batch updates are throttled, so a fast loop does not flood the GUI.
+class ProgressCallback(Callback):
+  def __init__(self, emit, interval=0.5):
+    self.emit = emit
+    self.interval = interval
+    self.last_emit = 0.0
+
+  def on_train_batch_end(self, trainer, pl_module, *args):
+    now = time.monotonic()
+    if now - self.last_emit >= self.interval:
+      self.last_emit = now
+      self.emit(self._make_progress(trainer))
+
+  def on_validation_end(self, trainer, pl_module):
+    if not trainer.running_sanity_check:
+      self.emit(self._make_progress(trainer))
+
+  def _make_progress(self, trainer):
+    metrics = {name: float(value) for name, value in trainer.callback_metrics.items()
+               if torch.is_tensor(value) and value.numel() == 1}
+    return {"epoch": trainer.current_epoch + 1, "max_epochs": trainer.max_epochs,
+            "batch": trainer.batch_idx + 1, "num_batches": trainer.num_training_batches, "metrics": metrics}
+
+# Writes training_summary.yaml to the run directory: epoch of best val_acc, epochs run,
+# wall time, and the time saved by stopping before max_epochs at the mean epoch time.
+# Both are kept in the resumable state, so a resumed run summarizes all of its sessions.
+class RunSummaryCallback(Callback):
+  def __init__(self, output_directory):
+    self.output_directory = output_directory
+    self.val_accs = []  # (epoch, val_acc) of each validation run
+    self.start_time = None
+    self.previous_seconds = 0.0  # Training time of the sessions before a resume
+
+  def on_train_start(self, trainer, pl_module):
+    self.start_time = time.monotonic()
+
+  def on_save_checkpoint(self, trainer, pl_module, checkpoint):
+    return {"val_accs": list(self.val_accs), "train_seconds": self._train_seconds()}
+
+  def on_load_checkpoint(self, callback_state):
+    self.val_accs = [tuple(epoch_acc) for epoch_acc in callback_state["val_accs"]]
+    self.previous_seconds = callback_state["train_seconds"]
+
+  def on_validation_end(self, trainer, pl_module):
+    if not trainer.running_sanity_check and 'val_acc' in trainer.callback_metrics:
+      self.val_accs.append((trainer.current_epoch + 1, float(trainer.callback_metrics['val_acc'])))
+
+  def on_train_end(self, trainer, pl_module):
+    seconds = self._train_seconds()
+    epochs = trainer.current_epoch + 1
+    summary = {"epochs_run": epochs, "max_epochs": trainer.max_epochs, "train_seconds": round(seconds, 1),
+               "stopped_early": epochs < trainer.max_epochs,
+               "seconds_saved": round(max(trainer.max_epochs - epochs, 0) * seconds / epochs, 1)}
+    if self.val_accs:
+      best_epoch, best_val_acc = max(self.val_accs, key=lambda epoch_acc: epoch_acc[1])
+      summary.update({"best_val_acc": best_val_acc, "best_epoch": best_epoch})
+    with open(self.output_directory + '/' + 'training_summary.yaml', 'w') as file:
+      yaml.dump(summary, file)
+
+  def _train_seconds(self):
+    if self.start_time is None:
+      return self.previous_seconds
+    return self.previous_seconds + time.monotonic() - self.start_time
+
+""" ---- Process Executor ---- """
+# Child process entry point. Events go back to the GUI as (kind, payload) tuples:
+# ("progress", dict), ("result", dict), then a final ("finished", None) or ("error", traceback string).
+# callbacks are extra picklable Trainer callbacks, ex. a sweep's pruner.
+def run_training_process(pipeline, run_name, model_dict, trainer_dict, num_threads, queue, callbacks=(), resume=False):
+  try:
+    if num_threads is not None:
+      torch.set_num_threads(num_threads)
+    progress = ProgressCallback(lambda info: queue.put(("progress", info)))
+    trainer, model, datamodule = build_training(pipeline, run_name, model_dict, trainer_dict, 
+                                                callbacks=[progress] + list(callbacks), resume=resume, 
+                                                cpu_budget=num_threads, own_process=True)
+    # Thread count is process-wide, so only set in a process of its own: tuned or --num_threads, else the budget
+    if model_dict.get('num_threads'):
+      torch.set_num_threads(model_dict['num_threads'])
+    queue.put(("result", fit_and_export(pipeline, run_name, trainer, model, datamodule)))
+  except Exception:
+    queue.put(("error", traceback.format_exc()))
+    return
+  queue.put(("finished", None))
+
+# Next event of a child started with run_training_process, or None if none arrives within timeout
+# (None polls without waiting). A child that exited without a final event gives an "error" event,
+# once the events it sent right before exiting have been read.
+def get_process_event(process, events, timeout=None):
+  try:
+    return events.get(timeout=timeout) if timeout is not None else events.get_nowait()
+  except queue.Empty:
+    if process.is_alive():
+      return None
+  try:
+    return events.get(timeout=1.0)
+  except queue.Empty:
+    process.join()
+    return ("error", f"Training process exited unexpectedly with code {process.exitcode}.")
@@ -0,0 +1,146 @@
+# ---- Standard Lib Imports ----
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+# ---- External Lib Imports ----
+from PIL import Image
+
+# ---- Local Lib Imports ----
+import app.utils as utils
+from .. import config
+from .dataset_index import IMAGE_EXTENSIONS
+from .cachefiles import make_cache_name, read_json, write_json
+
+""" ---- Dataset Integrity Scan ---- """
+# Finds the files that would crash or silently corrupt training before a DataLoader worker does:
+# zero-byte, truncated or undecodable files, 16-bit / float images, unusual modes, tiny images, and
+# an inconsistent train / valid / Class Map layout. Issues are (severity, problem) pairs, "error"
+# or "warning". Per-file results are cached by size and mtime, rescans only check changed files.
+HIGH_BIT_MODES = ('I', 'I;16', 'I;16B', 'I;16L', 'I;16N', 'F')
+CHUNK_SIZE = 64  # Files checked per worker task, results arrive in chunks of this size
+
+# on_progress(completed, total, issues) is called with the cached issues first, then per finished chunk.
+# is_cancelled() is polled between chunks. Returns the report, or None when cancelled.
+def scan_dataset(root, cache_dirpath, num_workers=None, on_progress=None, is_cancelled=None):
+  root = Path(root).resolve()
+  cache_path = Path(cache_dirpath) / (make_cache_name(root) + ".json")
+  cached = read_json(cache_path).get("files", {})
+  structure_issues = check_structure(root)
+
+  # Reuse results of unchanged files
+  files, missing = {}, []
+  for relative, size, mtime in _list_files(root):
+    entry = cached.get(relative)
+    if entry is not None and entry[:2] == [size, mtime]:
+      files[relative] = entry
+    else:
+      missing.append((relative, size, mtime))
+  total = len(files) + len(missing)
+  if on_progress is not None:
+    on_progress(len(files), total, structure_issues + _to_issues(files))
+
+  # Check the rest in parallel, spawned so no GUI threads are forked along
+  completed = len(files)
+  if missing:
+    chunks = [missing[start:start + CHUNK_SIZE] for start in range(0, len(missing), CHUNK_SIZE)]
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=num_workers or os.cpu_count(), mp_context=context) as executor:
+      futures = [executor.submit(check_files, str(root), chunk) for chunk in chunks]
+      try:
+        for future in as_completed(futures):
+          results = future.result()
+          files.update(results)
+          completed += len(results)
+          if on_progress is not None:
+            on_progress(completed, total, _to_issues(results))
+          if is_cancelled is not None and is_cancelled():
+            for pending in futures:
+              pending.cancel()
+            return None
+      finally:
+        write_json(cache_path, {"files": files})  # Finished chunks are kept even when cancelled
+
+  issues = structure_issues + _to_issues(files)
+  report = {"root": str(root), "num_files": total, "issues": issues,
+            "errors": sum(severity == "error" for severity, _, _ in issues),
+            "warnings": sum(severity == "warning" for severity, _, _ in issues)}
+  write_json(cache_path, {"files": files, "report": report})
+  return report
+
+# Worker task, returns {relative path: [size, mtime, issues]}
+def check_files(root, chunk):
+  return {relative: [size, mtime, check_file(os.path.join(root, relative), size)] for relative, size, mtime in chunk}
+
+def check_file(path, size):
+  if size == 0:
+    return [["error", "zero-byte file"]]
+  if not path.lower().endswith(IMAGE_EXTENSIONS):
+    return [["warning", "not an image file, skipped by training"]]
+  try:
+    with Image.open(path) as image:
+      mode, (width, height) = image.mode, image.size
+      image.draft('RGB', (64, 64))  # A full read still catches truncation, JPEGs decode at 1/8 scale
+      image.load()
+  except Exception as error:  # PIL raises OSError, SyntaxError, ValueError, DecompressionBombError...
+    return [["error", f"cannot decode: {error}"]]
+  issues = []
+  if mode in HIGH_BIT_MODES:
+    issues.append(["error", f"{mode} image, RGB conversion clips it to 8 bits"])
+  elif mode not in ('RGB', 'L'):
+    issues.append(["warning", f"{mode} image, converted to RGB for training"])
+  if min(width, height) < config.DATASET_MIN_IMAGE_SIDE:
+    issues.append(["warning", f"only {width}x{height} pixels"])
+  return issues
+
+# Image Classification layout: train/ and valid/ with the same class folders, plus the Class Map
+# with one index per class folder, in the sorted order the DataModule assigns them.
+def check_structure(root):
+  root = Path(root)
+  issues = []
+  splits = {}
+  for split in ("train", "valid"):
+    split_path = root / split
+    if not split_path.is_dir():
+      issues.append(["error", str(split_path), "missing split folder"])
+      continue
+    splits[split] = sorted(path.name for path in split_path.iterdir() if path.is_dir())
+    if not splits[split]:
+      issues.append(["error", str(split_path), "no class folders"])
+    for path in split_path.iterdir():
+      if path.is_file():
+        issues.append(["warning", str(path), "file outside the class folders, skipped by training"])
+      elif not any(path.rglob('*')):
+        issues.append(["error", str(path), "empty class folder"])
+  if len(splits) == 2 and splits["train"] != splits["valid"]:
+    different = sorted(set(splits["train"]) ^ set(splits["valid"]))
+    issues.append(["error", str(root), "classes only in train or valid: " + ", ".join(different)])
+
+  class_map_path = root / (config.IMAGE_CLASSIFICATION_CLASSMAP_FILENAME + ".txt")
+  if not class_map_path.is_file():
+    issues.append(["error", str(class_map_path), "missing class map"])
+  elif "train" in splits:
+    try:
+      class_map = utils.getClassMappingFromFile(str(class_map_path))
+    except (OSError, ValueError) as error:
+      issues.append(["error", str(class_map_path), f"unreadable class map: {error}"])
+    else:
+      expected = {name: index for index, name in enumerate(splits["train"])}
+      if class_map != expected:
+        issues.append(["error", str(class_map_path), "classes or indices differ from the train folders: " + 
+                       ", ".join(f"{name}: {index}" for name, index in expected.items())])
+  return [[severity, os.path.relpath(path, root), problem] for severity, path, problem in issues]
+
+def _list_files(root):
+  for dirpath, _, filenames in os.walk(root):
+    for filename in filenames:
+      path = os.path.join(dirpath, filename)
+      relative = os.path.relpath(path, root)
+      if relative == config.IMAGE_CLASSIFICATION_CLASSMAP_FILENAME + ".txt":
+        continue
+      stat = os.stat(path)
+      yield relative, stat.st_size, stat.st_mtime_ns
+
+def _to_issues(files):
+  return [[severity, relative, problem] for relative in sorted(files) for severity, problem in files[relative][2]]
@@ -0,0 +1,88 @@
+# predict.py
+# Headless Batch Inference, scores a directory with a trained run without the Qt interface.
+#   python -m app.predict --run <name> --input <dir> --out preds.jsonl
+#   python -m app.predict --run <name> --quantize     (writes the run's INT8 artifact)
+import sys
+import csv
+import json
+from pathlib import Path
+from argparse import ArgumentParser
+
+from .model.prediction import predict, quantizeModel
+
+def main(argv=None):
+  parser = ArgumentParser(prog="python -m app.predict", description="Run a trained model on a directory of images.")
+  parser.add_argument('--run', type=str, required=True, help="run name under the pipeline's database directory")
+  parser.add_argument('--input', type=str, default=None, help="directory of images to score")
+  parser.add_argument('--out', type=str, default=None, help="output file, .jsonl or .csv")
+  parser.add_argument('--pipeline', type=str, default="Image_Classification")
+  parser.add_argument('--database', type=str, default="database")
+  parser.add_argument('--format', type=str, choices=["jsonl", "csv"], default=None,
+                      help="output format, inferred from the --out extension by default")
+  parser.add_argument('--batch_size', type=int, default=None)
+  parser.add_argument('--num_workers', type=int, default=None)
+  parser.add_argument('--device', type=str, default="cpu", help="ex. cpu, cuda, cuda:1")
+  parser.add_argument('--precision', type=str, choices=["fp32", "int8"], default=None)
+  parser.add_argument('--no_cache', action='store_true', help="re-infer every image, ignoring cached predictions")
+  parser.add_argument('--quantize', action='store_true',
+                      help="write the run's INT8 artifact and quantization report, before scoring --input if given")
+  args = parser.parse_args(argv)
+
+  ckpt_dir = Path(args.database) / args.pipeline / args.run
+  if not ckpt_dir.is_dir():
+    parser.error(f"run not found: {ckpt_dir}")
+  if not args.quantize and (args.input is None or args.out is None):
+    parser.error("--input and --out are required unless --quantize is given")
+  if args.input is not None and args.out is None:
+    parser.error("--out is required with --input")
+
+  if args.quantize:
+    report = quantizeModel(args.pipeline, ckpt_dir)
+    print(f"Quantized {args.run}: accuracy {report['fp32_accuracy']:.3f} -> {report['int8_accuracy']:.3f}, "
+          f"{report['speedup']:.2f}x faster", file=sys.stderr)
+    if args.input is None:
+      return 0
+
+  if not Path(args.input).is_dir():
+    parser.error(f"input directory not found: {args.input}")
+  output_format = args.format or ("csv" if args.out.lower().endswith(".csv") else "jsonl")
+
+  # Rows are written as batches finish, so a long job leaves partial results behind
+  with open(args.out, 'w', newline='') as file:
+    write_rows = _make_writer(file, output_format)
+    def on_progress(completed, total, batch_predictions):
+      write_rows(batch_predictions)
+      file.flush()
+      print(f"\r{completed}/{total} images", end="", file=sys.stderr, flush=True)
+    predictions = predict(args.pipeline, args.input, ckpt_dir, batch_size=args.batch_size,
+                          num_workers=args.num_workers, on_progress=on_progress,
+                          device=args.device, precision=args.precision, use_cache=not args.no_cache)
+  print(file=sys.stderr)
+  if predictions is None:
+    return 1
+  print(f"Wrote {len(predictions['image_paths'])} predictions to {args.out}", file=sys.stderr)
+  return 0
+
+def _make_writer(file, output_format):
+  fields = ["image_path", "label", "confidence", "topk_labels", "topk_probs"]
+  if output_format == "csv":
+    writer = csv.writer(file)
+    writer.writerow(fields)
+  def write_rows(predictions):
+    for row in _iter_rows(predictions):
+      if output_format == "csv":
+        writer.writerow([row["image_path"], row["label"], row["confidence"],
+                         json.dumps(row["topk_labels"]), json.dumps(row["topk_probs"])])
+      else:
+        file.write(json.dumps(row) + "\n")
+  return write_rows
+
+def _iter_rows(predictions):
+  for image_path, label, confidence, topk_labels, topk_probs in zip(
+      predictions["image_paths"], predictions["labels"], predictions["confidences"],
+      predictions["topk_labels"], predictions["topk_probs"]):
+    yield {"image_path": image_path, "label": label, "confidence": float(confidence),
+           "topk_labels": list(topk_labels), "topk_probs": [float(prob) for prob in topk_probs]}
+
+if __name__ == '__main__':
+  sys.exit(main())
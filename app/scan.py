@@ -0,0 +1,61 @@
+# scan.py
+# Headless Dataset Integrity Scan, checks a dataset folder without the Qt interface.
+#   python -m app.scan --input <dir> [--out report.json]
+# Also the scan process of the Data Preparation panel: with --events, updates are written to stdout
+# as JSON lines and a "cancel" line on stdin stops the scan. Run with -m, the scan's spawned worker
+# processes only re-import this module and the scanner, not the Qt application and its models.
+import sys
+import json
+import threading
+from argparse import ArgumentParser
+
+from . import config
+from .model.validation import scan_dataset
+
+def main(argv=None):
+  parser = ArgumentParser(prog="python -m app.scan", description="Check a dataset folder for files that break training.")
+  parser.add_argument('--input', type=str, required=True, help="dataset directory, ex. with train/ and valid/")
+  parser.add_argument('--out', type=str, default=None, help="also write the report to this .json file")
+  parser.add_argument('--num_workers', type=int, default=config.DATASET_SCAN_WORKERS, help="worker processes, one per core by default")
+  parser.add_argument('--events', action='store_true', help="write JSON line events to stdout, for the GUI")
+  args = parser.parse_args(argv)
+
+  cancelled = threading.Event()
+  if args.events:
+    threading.Thread(target=_watch_stdin, args=(cancelled,), daemon=True).start()
+
+  def on_progress(completed, total, issues):
+    if args.events:
+      _emit("progress", [completed, total, issues])
+      return
+    for severity, path, problem in issues:
+      print(f"{severity.upper()}: {path} - {problem}")
+    print(f"\r{completed}/{total} files", end="", file=sys.stderr, flush=True)
+  report = scan_dataset(args.input, config.VALIDATION_CACHE_DIRPATH, num_workers=args.num_workers,
+                        on_progress=on_progress, is_cancelled=cancelled.is_set)
+  if report is None:
+    if args.events:
+      _emit("cancelled", None)
+    return 1
+
+  if args.out is not None:
+    with open(args.out, 'w') as file:
+      json.dump(report, file, indent=2)
+  if args.events:
+    _emit("finished", report)
+  else:
+    print(f"\nScanned {report['num_files']} files: {report['errors']} errors, {report['warnings']} warnings.", file=sys.stderr)
+  return 1 if report['errors'] else 0
+
+def _emit(kind, payload):
+  print(json.dumps([kind, payload]), flush=True)
+
+def _watch_stdin(cancelled):
+  # A "cancel" line, or the GUI closing the pipe, stops the scan between chunks
+  for line in sys.stdin:
+    if line.strip() == "cancel":
+      break
+  cancelled.set()
+
+if __name__ == '__main__':
+  sys.exit(main())
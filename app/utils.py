@@ -26,12 +26,16 @@ def getClassMappingFromDirectory(map_dirpath):
   return class_map
 
 def runNameUnique(run_name):
-  for pipeline_path in Path("database").iterdir():
-    for weights in pipeline_path.iterdir():
+  for pipeline_path in getRunDirectories("database"):
+    for weights in getRunDirectories(pipeline_path):
       if weights.name == run_name:
         return False
   return True
 
+# Subdirectories only, skips files kept next to runs such as sweep summaries
+def getRunDirectories(dirpath):
+  return [path for path in Path(dirpath).iterdir() if path.is_dir()]
+
 # Hash Helper
 def md5_update_from_dir(directory, hash):
   assert Path(directory).is_dir()
@@ -26,6 +26,27 @@ def addTrainingPipelines():
 # Followed by refreshInferenceWeights()
 
 
+""" ---- View API: Data Prep Panel ---- """
+def clearScanIssues():
+  ui_updates['clear_scan_issues']()
+
+def appendScanIssues(issue_strings):
+  ui_updates['append_scan_issues'](issue_strings)
+
+def updateScanProgress(completed, total):
+  ui_updates['update_scan_progress'](completed, total)
+
+def displayScanFeedback(feedback_string):
+  ui_updates['update_scan_feedback'](feedback_string)
+
+def disableScanButton():
+  ui_updates['update_scan_button']['disable']()
+  ui_updates['update_cancel_scan_button']['enable']()
+
+def enableScanButton():
+  ui_updates['update_scan_button']['enable']()
+  ui_updates['update_cancel_scan_button']['disable']()
+
 """ ---- View API: Model Panel ---- """
 def displayProgressPresentation(update_string):
   ui_updates['update_train_feedback'](update_string)
@@ -39,6 +60,12 @@ def disableTrainButton():
 def enableTrainButton():
   ui_updates['update_train_button']['enable']()
 
+def refreshJobList(job_strings):
+  ui_updates['update_job_list'](job_strings)
+
+def displayJobFeedback(feedback_string):
+  ui_updates['update_job_feedback'](feedback_string)
+
 """ ---- View API: Inference Panel ---- """
 def refreshInferenceWeightFeedback(feedback_string):
   ui_updates['update_weight_panel_feedback'](feedback_string)
@@ -46,6 +73,17 @@ def refreshInferenceWeightFeedback(feedback_string):
 def displayInferenceErrorPresentation(error_string):
   ui_updates['update_inference_feedback'](error_string)
 
+def updateInferenceProgress(completed, total):
+  ui_updates['update_inference_progress'](completed, total)
+
+def disableInferenceButton():
+  ui_updates['update_inference_button']['disable']()
+  ui_updates['update_cancel_inference_button']['enable']()
+
+def enableInferenceButton():
+  ui_updates['update_inference_button']['enable']()
+  ui_updates['update_cancel_inference_button']['disable']()
+
 """ ---- View API: Inference Explorer ---- """
 def presentInferenceView(image_path, label, slider_max):
   ui_updates['launch_inference_dialog'](image_path, label, slider_max)
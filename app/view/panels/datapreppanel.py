@@ -4,12 +4,40 @@ from PyQt5.QtWidgets import(
 )
 # ---- Local Lib Imports ----
 from app.view.widgets import (HSeperationLine, LineEditLayout, Button, TextBox, 
-  UploadWidget, Selector, Heading, Spacer 
+  UploadWidget, Selector, Heading, Spacer, ListWidget, ProgressBar
 )
 import app.view.api as view_api
 
 """ --- Custom Data Prep Panel Widgets --- """
+class DatasetScanner(QFrame):
+  def __init__(self):
+    super().__init__()
+    # Init Widgets
+    scan_button = Button(signal_key="scan_button", update_key="update_scan_button")
+    scan_button.setText("Scan Dataset")
+    cancel_button = Button(signal_key="cancel_scan_button", update_key="update_cancel_scan_button")
+    cancel_button.setText("Cancel")
+    cancel_button.disable()
+    scan_progress = ProgressBar(update_key="update_scan_progress")
+    scan_feedback = TextBox("", update_key="update_scan_feedback")
+    self.issue_list = ListWidget()
+
+    # Progress Layout
+    progress_layout = QHBoxLayout()
+    progress_layout.addWidget(scan_progress)
+    progress_layout.addWidget(cancel_button)
 
+    # Layout
+    layout = QVBoxLayout()
+    layout.addWidget(scan_button)
+    layout.addLayout(progress_layout)
+    layout.addWidget(scan_feedback)
+    layout.addWidget(self.issue_list)
+    self.setLayout(layout)
+
+    # Register Update Functions, issues are appended as the scan finds them
+    view_api.add_to_update_map(self.issue_list.clear, update_key="clear_scan_issues")
+    view_api.add_to_update_map(self.issue_list.addItems, update_key="append_scan_issues")
 
 
 """ --- Data Prep Panel Widget --- """
@@ -21,5 +49,10 @@ class DataPrepView(QFrame):
     layout = QVBoxLayout()
     layout.addWidget(Heading(' Data Preparation', font_size=20))
     layout.addWidget(HSeperationLine())
+    layout.addWidget(Heading(' 1) Upload Dataset Directory', font_size=12))
+    layout.addWidget(UploadWidget(signal_key="prep_dirpath"))
+    layout.addWidget(HSeperationLine())
+    layout.addWidget(Heading(' 2) Check Dataset Integrity', font_size=12))
+    layout.addWidget(DatasetScanner())
     layout.addItem(QSpacerItem(20, 150, QSizePolicy.Preferred, QSizePolicy.Expanding))
     self.setLayout(layout)
\ No newline at end of file
@@ -6,7 +6,8 @@ from PyQt5.QtWidgets import(
 
 # ---- Local Lib Imports ----
 from app.view.widgets import (Dialog, Heading, HSeperationLine, ListWidget, 
-  Selector, Button, Spacer, UploadWidget, Image, Slider, LineEditLayout, TextBox, ListWidgetSelector
+  Selector, Button, Spacer, UploadWidget, Image, Slider, LineEditLayout, TextBox, ListWidgetSelector, 
+  ProgressBar
 )
 import app.view.api as view_api
 
@@ -125,13 +126,23 @@ class InferenceLaunchpad(QFrame):
   def __init__(self):
     super().__init__()
     # Init Launchpad Widgets
-    inference_button = Button(signal_key="inference_button")
+    inference_button = Button(signal_key="inference_button", update_key="update_inference_button")
     inference_button.setText("Open Image Explorer")
+    cancel_button = Button(signal_key="cancel_inference_button", update_key="update_cancel_inference_button")
+    cancel_button.setText("Cancel")
+    cancel_button.disable()
+    inference_progress = ProgressBar(update_key="update_inference_progress")
     inference_feedback = TextBox("", update_key="update_inference_feedback")
 
+    # Progress Layout
+    progress_layout = QHBoxLayout()
+    progress_layout.addWidget(inference_progress)
+    progress_layout.addWidget(cancel_button)
+
     # Layout
     layout = QVBoxLayout()
     layout.addWidget(inference_button)
+    layout.addLayout(progress_layout)
     layout.addWidget(inference_feedback)
     self.setLayout(layout)
 
@@ -6,8 +6,9 @@ from PyQt5.QtWidgets import(
 
 # ---- Local Lib Imports ----
 from app.view.widgets import (HSeperationLine, LineEditLayout, Button, ListWidgetSelector, TextBox, 
-  UploadWidget, Selector, Heading, Spacer, Dialog
+  UploadWidget, Selector, Heading, Spacer, Dialog, ListWidget
 )
+import app.view.api as view_api
 
 """ --- Custom Model Panel Widgets --- """
 class ModelText(QFrame):
@@ -58,10 +59,13 @@ class ButtonPanel(QFrame):
     train_button.setText("Train")
     dash_button = Button(signal_key="dash_button")
     dash_button.setText("Open Dashboard")
+    sweep_button = Button(signal_key="sweep_button")
+    sweep_button.setText("Run Sweep")
 
     # Layout
     layout = QHBoxLayout()
     layout.addWidget(train_button)
+    layout.addWidget(sweep_button)
     layout.addWidget(dash_button)
     self.setLayout(layout)
 
@@ -71,16 +75,39 @@ class Runner(QFrame):
     # Init Widgets
     run_name = LineEditLayout(label_text="Experiment Name: ", 
                                       edit_text="Experiment 1", signal_key="run_name") 
+    priority = LineEditLayout(label_text="Queue Priority:    ", 
+                                      edit_text="0", signal_key="job_priority")
+    sweep_spec = LineEditLayout(label_text="Sweep Spec File:   ", 
+                                      edit_text="", signal_key="sweep_spec")
     buttons = ButtonPanel()
     train_feedback = TextBox("", update_key="update_train_feedback")
 
     # Layout
     layout = QVBoxLayout()
     layout.addLayout(run_name)
+    layout.addLayout(priority)
+    layout.addLayout(sweep_spec)
     layout.addWidget(buttons)
     layout.addWidget(train_feedback)
     self.setLayout(layout)
 
+class JobQueue(QFrame):
+  def __init__(self):
+    super().__init__()
+    # Init Widgets
+    self.job_list = ListWidget(update_key="update_job_list")
+    cancel_button = Button(signal_key="cancel_job_button")
+    cancel_button.setText("Cancel Queued Job")
+    job_feedback = TextBox("", update_key="update_job_feedback")
+    view_api.add_to_signal_map(self.job_list.currentRowChanged, signal_key="job_selection")
+
+    # Layout
+    layout = QVBoxLayout()
+    layout.addWidget(self.job_list)
+    layout.addWidget(cancel_button)
+    layout.addWidget(job_feedback)
+    self.setLayout(layout)
+
 """ --- Model Panel Widget --- """
 class ModelView(QFrame):
   def __init__(self):
@@ -103,6 +130,7 @@ class ModelView(QFrame):
     model_selector = Selector(widget_map, signal_key="train_pipeline")
     hp_edit = HyperparameterEdit()
     runner = Runner()
+    job_queue = JobQueue()
 
     # Layout
     layout = QVBoxLayout()
@@ -119,5 +147,8 @@ class ModelView(QFrame):
     layout.addWidget(HSeperationLine())
     layout.addWidget(Heading(' 3) Submit Training Run', font_size=12))
     layout.addWidget(runner)
+    layout.addWidget(HSeperationLine())
+    layout.addWidget(Heading(' Training Queue', font_size=12))
+    layout.addWidget(job_queue)
     layout.addItem(Spacer(20, 180))
     self.setLayout(layout)
\ No newline at end of file
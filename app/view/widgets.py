@@ -5,7 +5,7 @@ from pathlib import Path
 # Utility Widgets
 from PyQt5.QtWidgets import(
   QDialog, QFileDialog, QComboBox, QLineEdit, QListWidget, 
-  QPushButton, QLabel, QSlider, QStackedWidget, QAction)
+  QPushButton, QLabel, QSlider, QStackedWidget, QAction, QProgressBar)
 
 # Organization Widgets
 from PyQt5.QtWidgets import(
@@ -141,6 +141,18 @@ class Slider(QSlider):
   def updateSliderLength(self, length):
     self.setMaximum(length)
 
+class ProgressBar(QProgressBar):
+  def __init__(self, update_key=None):
+    super().__init__()
+    self.setRange(0, 1)
+    self.setValue(0)
+    if update_key is not None:
+      view_api.add_to_update_map(self.updateProgress, update_key)
+
+  def updateProgress(self, value, maximum):
+    self.setMaximum(max(maximum, 1)) # Empty jobs still render as complete
+    self.setValue(value)
+
 class Image(QLabel):
   def __init__(self, image_path, update_key=None):
     super().__init__()
@@ -254,6 +266,8 @@ class ListWidgetSelector(QFrame):
   selection = pyqtSignal(tuple) #2-ple: (name, index)
   renamedFile = pyqtSignal(tuple) # 3-ple: (name, index, updated_name)
   deletion = pyqtSignal(tuple) #3-ple: (name, index, deleted_name)
+  resumption = pyqtSignal(tuple) #3-ple: (name, index, run_name)
+  quantization = pyqtSignal(tuple) #3-ple: (name, index, run_name)
 
   def __init__(self, select_names, signal_key=None, update_key=None):
     super().__init__()
@@ -274,10 +288,18 @@ class ListWidgetSelector(QFrame):
       self.deleteAction = QAction(self)
       self.deleteAction.setText("Delete")
       list_widget.addAction(self.deleteAction)
+      self.resumeAction = QAction(self)
+      self.resumeAction.setText("Resume Training")
+      list_widget.addAction(self.resumeAction)
+      self.quantizeAction = QAction(self)
+      self.quantizeAction.setText("Quantize to INT8")
+      list_widget.addAction(self.quantizeAction)
 
       # Connect List Widget Edit / Popup Signals to Unified Callback
       list_widget.itemChanged.connect(self._renameFile)
       self.deleteAction.triggered.connect(self._deleteFile)
+      self.resumeAction.triggered.connect(self._resumeRun)
+      self.quantizeAction.triggered.connect(self._quantizeRun)
 
     # Layout
     layout = QVBoxLayout()
@@ -289,6 +311,8 @@ class ListWidgetSelector(QFrame):
       view_api.add_to_signal_map(self.selection, signal_key=signal_key) 
       view_api.add_to_signal_map(self.renamedFile, signal_key=signal_key+"_rename")
       view_api.add_to_signal_map(self.deletion, signal_key=signal_key+"_deletion")
+      view_api.add_to_signal_map(self.resumption, signal_key=signal_key+"_resume")
+      view_api.add_to_signal_map(self.quantization, signal_key=signal_key+"_quantize")
 
     # Register Update Function 
     if update_key is not None:
@@ -322,6 +346,20 @@ class ListWidgetSelector(QFrame):
       self.deletion.emit((selection, index, deleted_name))
       # print("Delete signal:", selection, index, deleted_name)
 
+  def _resumeRun(self):
+    # Emit Signal 
+    selection = self.getCurrentSelection()
+    list_widget = self.getCurrentWidget()
+    if list_widget.currentItem() is not None:
+      self.resumption.emit((selection, list_widget.getCurrentRow(), list_widget.getCurrentText()))
+
+  def _quantizeRun(self):
+    # Emit Signal 
+    selection = self.getCurrentSelection()
+    list_widget = self.getCurrentWidget()
+    if list_widget.currentItem() is not None:
+      self.quantization.emit((selection, list_widget.getCurrentRow(), list_widget.getCurrentText()))
+
   def getCurrentSelection(self):
     return self.selector.getCurrentSelection()
 
@@ -355,6 +393,14 @@ class ListWidgetSelector(QFrame):
     self.deleteAction = QAction(self)
     self.deleteAction.setText("Delete")
     list_widget.addAction(self.deleteAction)
+    self.resumeAction = QAction(self)
+    self.resumeAction.setText("Resume Training")
+    list_widget.addAction(self.resumeAction)
+    self.quantizeAction = QAction(self)
+    self.quantizeAction.setText("Quantize to INT8")
+    list_widget.addAction(self.quantizeAction)
     
     list_widget.itemChanged.connect(self._renameFile)
-    self.deleteAction.triggered.connect(self._deleteFile)
\ No newline at end of file
+    self.deleteAction.triggered.connect(self._deleteFile)
+    self.resumeAction.triggered.connect(self._resumeRun)
+    self.quantizeAction.triggered.connect(self._quantizeRun)
\ No newline at end of file
@@ -0,0 +1,44 @@
+# Shared fixtures, a tiny generated Image Classification dataset
+from argparse import ArgumentParser
+import pytest
+from PIL import Image
+
+@pytest.fixture
+def image_dataset(tmp_path):
+  # train/ and valid/ with classes a and b, 3 images each, plus the Class Map
+  root = tmp_path / "data"
+  for split in ("train", "valid"):
+    for class_name in ("a", "b"):
+      (root / split / class_name).mkdir(parents=True)
+      for index in range(3):
+        Image.new('RGB', (40, 32), (40 * index, 0, 0)).save(root / split / class_name / f"{index}.jpg")
+  (root / "Class Map.txt").write_text("a: 0\nb: 1\n")
+  return root
+
+@pytest.fixture
+def make_hparams():
+  # DataModule hyperparameters for the image_dataset, extra command line style arguments appended
+  datamodule = pytest.importorskip("app.model.pipelines.Image_Classification.datamodule")
+  def make(root, *args):
+    parser = ArgumentParser()
+    parser.add_argument('input_dirpath')
+    parser = datamodule.DataModule.add_model_specific_args(parser)
+    return vars(parser.parse_args([str(root), '--length', '8', '--width', '8', '--batch_size', '2',
+                                   '--num_workers', '0', '--val_num_workers', '0', '--normalize', 'fixed'] + list(args)))
+  return make
+
+@pytest.fixture
+def check_train_loader():
+  # Checks the train loader of a DataModule set up on the image_dataset
+  return _check_train_loader
+
+def _check_train_loader(datamodule):
+  datamodule.setup('fit')
+  assert datamodule.class_mapping == {"a": 0, "b": 1}
+  assert len(datamodule.train_data) == 6
+
+  loader = datamodule.train_dataloader()
+  assert len(loader) == 3
+  images, targets = next(iter(loader))
+  assert images.shape == (2, 3, 8, 8)
+  assert sorted(target for _, batch_targets in loader for target in batch_targets.tolist()) == [0, 0, 0, 1, 1, 1]
@@ -0,0 +1,129 @@
+# Tests of the loaded-model and per-image prediction caches
+import os
+from app.model.cache import ModelCache, PredictionCache
+from app.model.cachefiles import read_json
+
+""" ---- Loaded-Model Cache ---- """
+def make_checkpoints(root, count):
+  paths = []
+  for index in range(count):
+    path = root / f"model_{index}.ckpt"
+    path.write_bytes(b"weights")
+    paths.append(path)
+  return paths
+
+def test_model_cache_hit_loads_once(tmp_path):
+  ckpt_path, = make_checkpoints(tmp_path, 1)
+  cache, loads = ModelCache(max_entries=2), []
+  def loader():
+    loads.append(ckpt_path)
+    return len(loads)
+  assert cache.get(ckpt_path, loader) == 1
+  assert cache.get(str(ckpt_path), loader) == 1
+  assert len(loads) == 1
+  assert cache.stats() == {"hits": 1, "misses": 1, "evictions": 0, "entries": 1, "bytes": 0}
+
+def test_model_cache_evicts_least_recently_used(tmp_path):
+  first, second, third = make_checkpoints(tmp_path, 3)
+  cache = ModelCache(max_entries=2)
+  cache.get(first, lambda: "first")
+  cache.get(second, lambda: "second")
+  cache.get(first, lambda: "reloaded")  # first is now the most recently used
+  cache.get(third, lambda: "third")
+  assert cache.get(first, lambda: "reloaded") == "first"
+  assert cache.get(second, lambda: "reloaded") == "reloaded"
+  assert cache.stats()["evictions"] == 2
+
+def test_model_cache_max_bytes_keeps_newest(tmp_path):
+  first, second = make_checkpoints(tmp_path, 2)
+  cache = ModelCache(max_entries=4, max_bytes=100)
+  cache.get(first, lambda: "first", sizeof=lambda value: 60)
+  cache.get(second, lambda: "second", sizeof=lambda value: 150)
+  assert cache.stats()["entries"] == 1
+  assert cache.stats()["bytes"] == 150
+  assert cache.get(second, lambda: "reloaded") == "second"
+
+def test_model_cache_variants_are_separate(tmp_path):
+  ckpt_path, = make_checkpoints(tmp_path, 1)
+  cache = ModelCache(max_entries=4)
+  assert cache.get(ckpt_path, lambda: "fp32", variant=("cpu", "fp32")) == "fp32"
+  assert cache.get(ckpt_path, lambda: "int8", variant=("cpu", "int8")) == "int8"
+  assert cache.get(ckpt_path, lambda: "reloaded", variant=("cpu", "fp32")) == "fp32"
+
+def test_model_cache_modified_checkpoint_misses(tmp_path):
+  ckpt_path, = make_checkpoints(tmp_path, 1)
+  cache = ModelCache(max_entries=4)
+  cache.get(ckpt_path, lambda: "old")
+  stat = os.stat(ckpt_path)
+  os.utime(ckpt_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))  # Retrained
+  assert cache.get(ckpt_path, lambda: "new") == "new"
+
+""" ---- Per-Image Prediction Cache ---- """
+def make_prediction_cache(tmp_path, **kwargs):
+  return PredictionCache(tmp_path / "predictions", "Image_Classification", tmp_path / "model.ckpt",
+                         tmp_path / "images", **kwargs)
+
+def make_images(tmp_path, count):
+  (tmp_path / "images").mkdir()
+  (tmp_path / "model.ckpt").write_bytes(b"weights")
+  paths = []
+  for index in range(count):
+    path = tmp_path / "images" / f"{index}.jpg"
+    path.write_bytes(b"image")
+    paths.append(str(path))
+  return paths
+
+def test_prediction_cache_reuses_saved_records(tmp_path):
+  image_paths = make_images(tmp_path, 2)
+  cache = make_prediction_cache(tmp_path)
+  assert cache.lookup(image_paths) == ({}, image_paths)
+  cache.update(image_paths, [{"label": "a"}, {"label": "b"}])
+  cache.save()
+
+  cached, missing = make_prediction_cache(tmp_path).lookup(image_paths)
+  assert cached == {image_paths[0]: {"label": "a"}, image_paths[1]: {"label": "b"}}
+  assert missing == []
+
+def test_prediction_cache_modified_image_misses(tmp_path):
+  image_paths = make_images(tmp_path, 2)
+  cache = make_prediction_cache(tmp_path)
+  cache.update(image_paths, [{"label": "a"}, {"label": "b"}])
+  cache.save()
+  with open(image_paths[1], "ab") as file:
+    file.write(b"edited")
+  cached, missing = make_prediction_cache(tmp_path).lookup(image_paths)
+  assert list(cached) == [image_paths[0]]
+  assert missing == [image_paths[1]]
+
+def test_prediction_cache_drops_removed_images(tmp_path):
+  image_paths = make_images(tmp_path, 2)
+  cache = make_prediction_cache(tmp_path)
+  cache.update(image_paths, [{"label": "a"}, {"label": "b"}])
+  cache.save()
+  os.remove(image_paths[1])
+
+  cache = make_prediction_cache(tmp_path)
+  cache.lookup(image_paths[:1])
+  cache.save()
+  assert len(read_json(cache.cache_path)) == 1
+
+def test_prediction_cache_separates_precision_and_artifact(tmp_path):
+  make_images(tmp_path, 1)
+  (tmp_path / "model.onnx").write_bytes(b"exported")
+  fp32 = make_prediction_cache(tmp_path)
+  int8 = make_prediction_cache(tmp_path, precision="int8")
+  exported = make_prediction_cache(tmp_path, artifact_path=tmp_path / "model.onnx")
+  assert len({fp32.cache_path, int8.cache_path, exported.cache_path}) == 3
+
+def test_prediction_cache_evicts_least_recently_used(tmp_path):
+  image_paths = make_images(tmp_path, 1)
+  older = make_prediction_cache(tmp_path, precision="int8")
+  older.update(image_paths, [{"label": "a" * 100}])
+  older.save()
+  os.utime(older.cache_path, (0, 0))
+
+  current = make_prediction_cache(tmp_path, max_bytes=150)
+  current.update(image_paths, [{"label": "b" * 100}])
+  current.save()
+  assert current.cache_path.is_file()
+  assert not older.cache_path.exists()
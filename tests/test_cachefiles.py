@@ -0,0 +1,37 @@
+# Tests of the shared cache file helpers
+from app.model.cachefiles import build_directory, open_build, read_json, write_json
+
+def write_marker(temp_path):
+  (temp_path / "marker").write_text("built")
+
+def test_write_json_round_trip(tmp_path):
+  write_json(tmp_path / "nested" / "cache.json", {"key": [1, 2]})
+  assert read_json(tmp_path / "nested" / "cache.json") == {"key": [1, 2]}
+  assert list((tmp_path / "nested").iterdir()) == [tmp_path / "nested" / "cache.json"]
+
+def test_read_json_missing_or_corrupt_is_empty(tmp_path):
+  assert read_json(tmp_path / "missing.json") == {}
+  (tmp_path / "corrupt.json").write_text('{"key": ')
+  assert read_json(tmp_path / "corrupt.json") == {}
+
+def test_build_directory_reuses_a_build(tmp_path):
+  builds = []
+  def build(temp_path):
+    builds.append(temp_path)
+    write_marker(temp_path)
+  version_path = build_directory(tmp_path / "cache", "first", build)
+  assert (version_path / "marker").read_text() == "built"
+  assert build_directory(tmp_path / "cache", "first", build) == version_path
+  assert len(builds) == 1
+
+def test_build_directory_removes_unused_builds(tmp_path):
+  first = build_directory(tmp_path / "cache", "first", write_marker)
+  in_use = build_directory(tmp_path / "cache", "second", write_marker)
+  handle = open_build(in_use)
+  try:
+    latest = build_directory(tmp_path / "cache", "third", write_marker)
+    assert not first.exists()
+    assert (in_use / "marker").exists()  # Still open by a reader
+    assert (latest / "marker").exists()
+  finally:
+    handle.close()
@@ -0,0 +1,42 @@
+# Tests of the persistent dataset index and the ImageFolder built on it
+from pathlib import Path
+import pytest
+from PIL import Image
+from app.model.dataset_index import DatasetIndex
+
+def test_refresh_lists_classes_and_samples(tmp_path, image_dataset):
+  (image_dataset / "train" / "a" / "Thumbs.db").write_bytes(b"not an image")
+  index = DatasetIndex(tmp_path / "indexes", image_dataset / "train").refresh()
+  assert index.classes() == ["a", "b"]
+  samples = index.samples()
+  assert len(samples) == 6
+  assert [target for _, target in samples] == [0, 0, 0, 1, 1, 1]
+  assert not any(path.endswith("Thumbs.db") for path, _ in samples)
+  assert all(record[2:] == [40, 32] for _, _, record in index.entries())
+
+def test_refresh_picks_up_new_images(tmp_path, image_dataset):
+  DatasetIndex(tmp_path / "indexes", image_dataset / "train").refresh()
+  Image.new('RGB', (40, 32)).save(image_dataset / "train" / "b" / "3.jpg")
+  index = DatasetIndex(tmp_path / "indexes", image_dataset / "train").refresh()
+  assert len(index.samples()) == 7
+  assert index.samples()[-1] == (str((image_dataset / "train" / "b" / "3.jpg").resolve()), 1)
+
+def test_unlabeled_paths(tmp_path, image_dataset):
+  index = DatasetIndex(tmp_path / "indexes", image_dataset / "valid" / "a", labeled=False).refresh()
+  assert [Path(path).name for path in index.paths()] == ["0.jpg", "1.jpg", "2.jpg"]
+
+def test_indexed_image_folder_matches_image_folder(tmp_path, image_dataset):
+  pytest.importorskip("pytorch_lightning")
+  from torchvision import datasets
+  from app.model.pipelines.Image_Classification.datamodule import IndexedImageFolder
+  folder = IndexedImageFolder(DatasetIndex(tmp_path / "indexes", image_dataset / "train").refresh())
+  reference = datasets.ImageFolder(str((image_dataset / "train").resolve()))
+  assert len(folder) == len(reference)
+  assert folder.samples == reference.samples
+  assert folder.class_to_idx == reference.class_to_idx
+
+def test_folder_train_loader(tmp_path, image_dataset, make_hparams, check_train_loader):
+  from app.model.pipelines.Image_Classification.datamodule import DataModule
+  datamodule = DataModule(make_hparams(image_dataset, '--dataset_format', 'folder'),
+                          cache_dirpath=tmp_path / "cache", index_dirpath=tmp_path / "indexes")
+  check_train_loader(datamodule)
@@ -0,0 +1,15 @@
+# Smoke test of the memory-mapped pre-decoded dataset cache
+import pytest
+
+pytest.importorskip("pytorch_lightning")
+from app.model.pipelines.Image_Classification.datamodule import DataModule
+
+def test_memmap_train_loader(tmp_path, image_dataset, make_hparams, check_train_loader):
+  hparams = make_hparams(image_dataset, '--dataset_format', 'memmap')
+  datamodule = DataModule(hparams, cache_dirpath=tmp_path / "cache", index_dirpath=tmp_path / "indexes")
+  check_train_loader(datamodule)
+
+  # An unchanged dataset reuses its build
+  reloaded = DataModule(hparams, cache_dirpath=tmp_path / "cache", index_dirpath=tmp_path / "indexes")
+  reloaded.setup('fit')
+  assert reloaded.train_data.cache_path == datamodule.train_data.cache_path
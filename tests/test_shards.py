@@ -0,0 +1,10 @@
+# Smoke test of the sequential tar shard dataset format
+import pytest
+
+pytest.importorskip("pytorch_lightning")
+from app.model.pipelines.Image_Classification.datamodule import DataModule
+
+def test_shards_train_loader(tmp_path, image_dataset, make_hparams, check_train_loader):
+  datamodule = DataModule(make_hparams(image_dataset, '--dataset_format', 'shards'),
+                          cache_dirpath=tmp_path / "cache", index_dirpath=tmp_path / "indexes")
+  check_train_loader(datamodule)
@@ -0,0 +1,45 @@
+# Tests of the dataset statistics used for data-driven normalization
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("torchvision")
+from app.model.pipelines.Image_Classification.stats import FIXED_MEAN, FIXED_STD, ImageMoments, _merge_moments
+
+def make_row(pixels):
+  # Same layout as ImageMoments, pixels is (3, n)
+  mean = pixels.mean(dim=1)
+  squared_deviations = (pixels - mean[:, None]).pow(2).sum(dim=1)
+  return [float(pixels.shape[1])] + mean.tolist() + squared_deviations.tolist()
+
+def test_merge_matches_direct_statistics():
+  generator = torch.Generator().manual_seed(0)
+  images = [torch.rand(3, count, generator=generator, dtype=torch.float64) for count in (12, 40, 7)]
+  mean, std = _merge_moments([make_row(pixels) for pixels in images])
+  pixels = torch.cat(images, dim=1)
+  assert mean == pytest.approx(pixels.mean(dim=1).tolist())
+  assert std == pytest.approx(pixels.std(dim=1, unbiased=False).tolist())
+
+def test_merge_ignores_unreadable_images():
+  pixels = torch.rand(3, 20, dtype=torch.float64)
+  mean, std = _merge_moments([make_row(pixels), [0.0] * 7])
+  assert mean == pytest.approx(pixels.mean(dim=1).tolist())
+  assert std == pytest.approx(pixels.std(dim=1, unbiased=False).tolist())
+
+def test_merge_without_pixels_is_fixed():
+  assert _merge_moments([]) == (FIXED_MEAN, FIXED_STD)
+  assert _merge_moments([[0.0] * 7]) == (FIXED_MEAN, FIXED_STD)
+
+def test_corrupt_image_weighs_nothing(tmp_path):
+  (tmp_path / "corrupt.jpg").write_bytes(b"\xff\xd8\xff\xe0 truncated")
+  row = ImageMoments([str(tmp_path / "corrupt.jpg")], 8, 8)[0]
+  assert row.tolist() == [0.0] * 7
+
+def test_compute_statistics_of_a_folder(tmp_path, image_dataset):
+  from app.model.dataset_index import DatasetIndex
+  from app.model.pipelines.Image_Classification.stats import compute_statistics
+  index = DatasetIndex(tmp_path / "indexes", image_dataset / "train").refresh()
+  stats = compute_statistics(index, 8, 8, tmp_path / "stats")
+  assert stats["stats_images"] == 6
+  assert stats["image_sizes"] == {"40x32": 6}
+  assert stats["norm_mean"][1] == pytest.approx(0.0, abs=0.01)  # Only the red channel varies
+  assert compute_statistics(index, 8, 8, tmp_path / "stats") == stats  # From the cached moments
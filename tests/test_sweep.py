@@ -0,0 +1,51 @@
+# Tests of sweep trial expansion and hyperparameter overrides
+import pytest
+
+pytest.importorskip("pytorch_lightning")
+from app.model.sweep import Sweep, make_trials
+
+""" ---- Search Spaces ---- """
+def test_grid_is_the_product_of_lists():
+  trials = make_trials({"method": "grid", "params": {"lr": [0.1, 0.01], "batch_size": [8, 16], "max_epochs": 3}})
+  assert trials == [{"lr": 0.1, "batch_size": 8, "max_epochs": 3}, {"lr": 0.1, "batch_size": 16, "max_epochs": 3},
+                    {"lr": 0.01, "batch_size": 8, "max_epochs": 3}, {"lr": 0.01, "batch_size": 16, "max_epochs": 3}]
+
+def test_grid_rejects_ranges():
+  with pytest.raises(ValueError):
+    make_trials({"method": "grid", "params": {"lr": {"min": 1e-5, "max": 1e-2}}})
+
+def test_random_samples_are_seeded_and_in_range():
+  spec = {"method": "random", "num_trials": 20, "seed": 3,
+          "params": {"lr": {"min": 1e-5, "max": 1e-2, "log": True}, "batch_size": {"min": 8, "max": 64},
+                     "scheduler": ["none", "plateau"]}}
+  trials = make_trials(spec)
+  assert trials == make_trials(spec)
+  assert len(trials) == 20
+  for trial in trials:
+    assert 1e-5 <= trial["lr"] <= 1e-2
+    assert isinstance(trial["batch_size"], int) and 8 <= trial["batch_size"] <= 64
+    assert trial["scheduler"] in ("none", "plateau")
+
+""" ---- Sweep Runner ---- """
+def make_sweep(image_dataset, params, model_input=()):
+  return Sweep("Image_Classification", "Test", {"method": "grid", "params": params},
+               [str(image_dataset)] + list(model_input), [])
+
+def test_trials_override_model_and_trainer_arguments(image_dataset):
+  sweep = make_sweep(image_dataset, {"lr": [0.1, 0.01], "max_epochs": 2}, ['--lr', '0.5'])
+  assert sweep.run_names() == ["Test - Trial 01", "Test - Trial 02"]
+  assert [trial["model_dict"]["lr"] for trial in sweep.trials] == [0.1, 0.01]
+  assert all(trial["trainer_dict"]["max_epochs"] == 2 for trial in sweep.trials)
+  assert all(trial["status"] == "queued" and trial["error"] is None for trial in sweep.trials)
+
+def test_trials_switch_flags_on_and_off(image_dataset):
+  sweep = make_sweep(image_dataset, {"feature_store": [True, False]}, ['--feature_store'])
+  assert [trial["model_dict"]["feature_store"] for trial in sweep.trials] == [True, False]
+
+def test_invalid_choice_raises(image_dataset):
+  with pytest.raises(ValueError, match="trial 1"):
+    make_sweep(image_dataset, {"scheduler": ["cosine"]})
+
+def test_unknown_hyperparameter_raises(image_dataset):
+  with pytest.raises(ValueError, match="not_an_argument"):
+    make_sweep(image_dataset, {"not_an_argument": [1]})
@@ -0,0 +1,61 @@
+# Tests of the dataset integrity scan
+import os
+from PIL import Image
+from app.model.validation import check_file, check_structure, scan_dataset
+
+def check(path):
+  return check_file(str(path), path.stat().st_size)
+
+""" ---- Files ---- """
+def test_good_image_has_no_issues(tmp_path):
+  Image.new('RGB', (40, 32)).save(tmp_path / "good.jpg")
+  assert check(tmp_path / "good.jpg") == []
+
+def test_zero_byte_file_is_an_error(tmp_path):
+  (tmp_path / "empty.jpg").write_bytes(b"")
+  assert check(tmp_path / "empty.jpg") == [["error", "zero-byte file"]]
+
+def test_non_image_file_is_a_warning(tmp_path):
+  (tmp_path / "notes.txt").write_text("notes")
+  assert [severity for severity, _ in check(tmp_path / "notes.txt")] == ["warning"]
+
+def test_truncated_image_is_an_error(tmp_path):
+  Image.new('RGB', (64, 64), (200, 10, 10)).save(tmp_path / "full.png")
+  data = (tmp_path / "full.png").read_bytes()
+  (tmp_path / "truncated.png").write_bytes(data[:len(data) // 2])
+  issues = check(tmp_path / "truncated.png")
+  assert len(issues) == 1
+  assert issues[0][0] == "error" and issues[0][1].startswith("cannot decode")
+
+def test_unusual_mode_and_tiny_image_are_warnings(tmp_path):
+  Image.new('CMYK', (40, 40)).save(tmp_path / "cmyk.jpg")
+  Image.new('RGB', (16, 40)).save(tmp_path / "tiny.png")
+  assert [severity for severity, _ in check(tmp_path / "cmyk.jpg")] == ["warning"]
+  assert check(tmp_path / "tiny.png") == [["warning", "only 16x40 pixels"]]
+
+""" ---- Layout ---- """
+def test_good_layout_has_no_issues(image_dataset):
+  assert check_structure(image_dataset) == []
+
+def test_layout_issues(image_dataset):
+  (image_dataset / "valid" / "b" / "0.jpg").rename(image_dataset / "valid" / "c.jpg")
+  for path in (image_dataset / "valid" / "b").iterdir():
+    path.unlink()
+  (image_dataset / "Class Map.txt").write_text("a: 1\nb: 0\n")
+  issues = check_structure(image_dataset)
+  assert sorted((severity, path) for severity, path, _ in issues) == [
+    ("error", "Class Map.txt"), ("error", os.path.join("valid", "b")), ("warning", os.path.join("valid", "c.jpg"))]
+
+""" ---- Scan ---- """
+def test_scan_reports_and_caches(tmp_path, image_dataset):
+  (image_dataset / "train" / "a" / "empty.jpg").write_bytes(b"")
+  report = scan_dataset(image_dataset, tmp_path / "scans", num_workers=1)
+  assert report["num_files"] == 13
+  assert (report["errors"], report["warnings"]) == (1, 0)
+  assert report["issues"] == [["error", os.path.join("train", "a", "empty.jpg"), "zero-byte file"]]
+
+  progress = []
+  rescan = scan_dataset(image_dataset, tmp_path / "scans", num_workers=1,
+                        on_progress=lambda completed, total, issues: progress.append((completed, total)))
+  assert rescan == report
+  assert progress == [(13, 13)]  # Every file from the cache, nothing rechecked